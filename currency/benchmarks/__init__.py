@@ -0,0 +1,8 @@
+"""
+currency_sync 性能基准测试。
+
+在本地启动模拟 Currencyapi 和 ExchangeRate-API 的 HTTP 服务，配合 SQLite 或 MySQL
+测量同步延迟、回填吞吐量和数据库写入耗时。在 currency 目录下运行:
+
+    poetry run python -m benchmarks.run --help
+"""
@@ -0,0 +1,192 @@
+"""
+同步性能基准测试入口。
+
+示例:
+    poetry run python -m benchmarks.run --latency 0.05 --error-rate 0.02 --backfill-days 180
+    poetry run python -m benchmarks.run --json result.json --compare baseline.json
+
+测量:
+    sync       连续执行 sync_date(None) 的端到端延迟(每次模拟接口都会返回新的最新汇率)
+    backfill   回填 --backfill-days 天历史汇率的吞吐量(天/秒)
+    db_write   上述过程中 save_rates_many 的累计耗时
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+from datetime import date, timedelta
+from typing import Any, Dict, List
+
+from benchmarks.sqlite_db import SQLiteRateDB, TimedDB
+from benchmarks.stub_servers import StubConfig, StubServer
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法分位数"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def point_to_stub(provider, base_url: str) -> None:
+    """
+    将提供方的接口地址替换为模拟服务地址
+
+    Args:
+        provider: 提供方，可以是 CachedProvider 包装后的实例
+        base_url: 模拟服务根地址
+    """
+    from currency_sync.providers import CurrencyApiProvider, ExchangeRateApiProvider
+
+    target = getattr(provider, '_provider', provider)
+    if isinstance(target, CurrencyApiProvider):
+        target.api_url = f"{base_url}/v3/latest"
+        target.historical_api_url = f"{base_url}/v3/historical"
+        target.range_api_url = f"{base_url}/v3/range"
+        target.api_key = 'stub'
+    elif isinstance(target, ExchangeRateApiProvider):
+        target.latest_api_url = base_url + "/v6/{api_key}/latest/{base_currency}"
+        target.history_api_url = base_url + "/v6/{api_key}/history/{base_currency}/{year}/{month}/{day}"
+        target.api_key = 'stub'
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="currency_sync 性能基准测试")
+    parser.add_argument("--provider", "-p", help="只测试指定提供方，默认按正常流程使用全部提供方", default=None)
+    parser.add_argument("--latency", help="模拟接口的基础延迟(秒)，默认0.05", type=float, default=0.05)
+    parser.add_argument("--jitter", help="叠加的随机延迟上限(秒)，默认0", type=float, default=0.0)
+    parser.add_argument("--error-rate", help="模拟接口返回500的概率，默认0", type=float, default=0.0)
+    parser.add_argument("--currencies", help="每份快照的币种数量，默认170", type=int, default=170)
+    parser.add_argument("--no-range", help="模拟 Currencyapi range 接口不可用，回填回退为逐日请求",
+                        action="store_true")
+    parser.add_argument("--sync-runs", help="sync 测量次数，默认20", type=int, default=20)
+    parser.add_argument("--backfill-days", help="回填天数，默认90，0表示跳过", type=int, default=90)
+    parser.add_argument("--concurrency", "-c", help="回填并发数，默认4", type=int, default=4)
+    parser.add_argument("--async", dest="use_async", help="回填使用 aiohttp 异步请求", action="store_true")
+    parser.add_argument("--hedge-delay", help="启用对冲模式的延迟(秒)", type=float, default=None)
+    parser.add_argument("--bases", help="需要保存的基础货币，逗号分隔", default=None)
+    parser.add_argument("--db", help="数据库: sqlite 为内存 SQLite，mysql 使用环境变量配置的 MySQL，默认sqlite",
+                        choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--rate-limit", help="提供方限速(每秒请求数)，默认0即不限速", type=float, default=0.0)
+    parser.add_argument("--seed", help="随机数种子，默认0", type=int, default=0)
+    parser.add_argument("--json", help="将结果写入JSON文件，便于多次运行对比", default=None)
+    parser.add_argument("--compare", help="与之前 --json 保存的结果对比", default=None)
+    parser.add_argument("--verbose", "-v", help="保留同步过程的日志输出", action="store_true")
+    return parser
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """执行基准测试并返回结果"""
+    # 必须在创建提供方之前设置，提供方初始化时读取
+    os.environ['CURRENCYAPI_RATE_LIMIT'] = str(args.rate_limit)
+    os.environ['EXCHANGERATE_API_RATE_LIMIT'] = str(args.rate_limit)
+    state_dir = tempfile.mkdtemp(prefix='currency_sync_bench_')
+    os.environ['PROVIDER_STATS_PATH'] = os.path.join(state_dir, 'provider_stats.json')
+
+    from currency_sync.main import ExchangeRateSynchronizer, parse_bases
+
+    if not args.verbose:
+        for name in list(logging.root.manager.loggerDict):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    server = StubServer(StubConfig(args.latency, args.jitter, args.error_rate, args.currencies,
+                                   not args.no_range, args.seed)).start()
+    synchronizer = ExchangeRateSynchronizer(provider_name=args.provider, hedge_delay=args.hedge_delay,
+                                            use_cache=False, bases=parse_bases(args.bases) if args.bases else None,
+                                            use_async=args.use_async)
+    for provider in synchronizer.providers:
+        point_to_stub(provider, server.url)
+    synchronizer.db.close()
+    db = TimedDB(SQLiteRateDB() if args.db == 'sqlite' else synchronizer.db)
+    synchronizer.db = db
+
+    results: Dict[str, Any] = {'config': {key: value for key, value in vars(args).items()
+                                          if key not in ('json', 'compare', 'verbose')}}
+    try:
+        latencies, failures = [], 0
+        for _ in range(args.sync_runs):
+            started = time.perf_counter()
+            if not synchronizer.sync_date(None):
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+        if latencies:
+            results['sync'] = {
+                'runs': len(latencies),
+                'failures': failures,
+                'mean_s': sum(latencies) / len(latencies),
+                'p50_s': percentile(latencies, 50),
+                'p95_s': percentile(latencies, 95),
+                'max_s': max(latencies)
+            }
+        sync_db = {'calls': db.calls, 'snapshots': db.snapshots, 'seconds': db.seconds}
+        db.reset()
+
+        if args.backfill_days > 0:
+            end_date = date.today() - timedelta(days=1)
+            start_date = end_date - timedelta(days=args.backfill_days - 1)
+            requests_before = server.requests
+            started = time.perf_counter()
+            backfilled = synchronizer.backfill(start_date, end_date, args.concurrency)
+            elapsed = time.perf_counter() - started
+            filled = sum(1 for ok in backfilled.values() if ok)
+            results['backfill'] = {
+                'days': len(backfilled),
+                'filled': filled,
+                'seconds': elapsed,
+                'days_per_s': filled / elapsed if elapsed else 0.0,
+                'http_requests': server.requests - requests_before
+            }
+        backfill_db = {'calls': db.calls, 'snapshots': db.snapshots, 'seconds': db.seconds}
+
+        results['db_write'] = {
+            'sync_seconds': sync_db['seconds'],
+            'sync_calls': sync_db['calls'],
+            'backfill_seconds': backfill_db['seconds'],
+            'backfill_calls': backfill_db['calls'],
+            'ms_per_snapshot': 1000 * (sync_db['seconds'] + backfill_db['seconds'])
+                               / max(1, sync_db['snapshots'] + backfill_db['snapshots'])
+        }
+        results['http_requests'] = server.requests
+    finally:
+        synchronizer.close()
+        server.stop()
+    return results
+
+
+def print_results(results: Dict[str, Any], baseline: Dict[str, Any] = None) -> None:
+    """打印结果，指定 baseline 时附带变化百分比"""
+    for section in ('sync', 'backfill', 'db_write'):
+        if section not in results:
+            continue
+        print(f"[{section}]")
+        for key, value in results[section].items():
+            line = f"  {key:<18}{value:>14.4f}" if isinstance(value, float) else f"  {key:<18}{value:>14}"
+            previous = (baseline or {}).get(section, {}).get(key)
+            if isinstance(previous, (int, float)) and previous:
+                line += f"  ({(value - previous) / previous:+.1%})"
+            print(line)
+    print(f"模拟接口请求总数: {results.get('http_requests', 0)}")
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run(args)
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
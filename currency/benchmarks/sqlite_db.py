@@ -0,0 +1,128 @@
+"""
+基准测试用的数据库实现。
+
+SQLiteRateDB 用 SQLite 模拟 ExchangeRateDB 中同步流程用到的接口，表结构与 currency.sql 对应；
+TimedDB 包装任意数据库实例，统计写入耗时。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+
+class SQLiteRateDB:
+    """SQLite 版本的 ExchangeRateDB，可在多个线程间共享"""
+
+    def __init__(self, path: str = ':memory:'):
+        """
+        Args:
+            path: 数据库文件路径，默认使用内存数据库
+        """
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS exchange_rates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                base_currency TEXT NOT NULL,
+                currencies TEXT NOT NULL,
+                data_provider TEXT NOT NULL,
+                data_updated_at TEXT NOT NULL,
+                UNIQUE (base_currency, data_provider, data_updated_at)
+            );
+            CREATE INDEX IF NOT EXISTS idx_data_updated_at ON exchange_rates (data_updated_at);
+            CREATE TABLE IF NOT EXISTS exchange_rate_points (
+                base_currency TEXT NOT NULL,
+                quote_currency TEXT NOT NULL,
+                rate_date TEXT NOT NULL,
+                rate REAL NOT NULL,
+                data_provider TEXT NOT NULL,
+                PRIMARY KEY (base_currency, quote_currency, rate_date)
+            ) WITHOUT ROWID;
+        """)
+
+    def save_rates_many(self, snapshots: List[Dict[str, Any]], base_currency: Optional[str] = None,
+                        batch_size: Optional[int] = None, upsert: bool = True) -> bool:
+        """在一个事务中批量保存多份汇率数据，参数同 ExchangeRateDB.save_rates_many"""
+        rows, point_rows = [], []
+        for snapshot in snapshots:
+            base = snapshot.get('base_currency', base_currency)
+            updated_at = snapshot['data_updated_at']
+            rows.append((base, json.dumps(snapshot['currencies']), snapshot['data_provider'], updated_at.isoformat()))
+            point_rows.extend(
+                (base, quote, updated_at.date().isoformat(), rate, snapshot['data_provider'])
+                for quote, rate in snapshot['currencies'].items() if rate
+            )
+
+        verb = 'INSERT OR REPLACE' if upsert else 'INSERT OR IGNORE'
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        f"{verb} INTO exchange_rates (base_currency, currencies, data_provider, data_updated_at) "
+                        f"VALUES (?, ?, ?, ?)", rows)
+                    self._conn.executemany(f"INSERT OR REPLACE INTO exchange_rate_points VALUES (?, ?, ?, ?, ?)",
+                                           point_rows)
+                return True
+            except sqlite3.Error:
+                return False
+
+    def get_latest_rates(self, base_currency: str) -> Optional[Dict[str, float]]:
+        """查询最近一次保存的汇率数据"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT currencies FROM exchange_rates WHERE base_currency = ? "
+                "ORDER BY data_updated_at DESC, id DESC LIMIT 1", (base_currency,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_existing_dates(self, start_date: date, end_date: date, base_currency: Optional[str] = None) -> Set[date]:
+        """查询一段日期内已有快照的日期"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT substr(data_updated_at, 1, 10) FROM exchange_rates "
+                "WHERE base_currency = ? AND data_updated_at >= ? AND data_updated_at < ?",
+                (base_currency or 'USD', start_date.isoformat(), (end_date + timedelta(days=1)).isoformat())
+            ).fetchall()
+        return {date.fromisoformat(row[0]) for row in rows}
+
+    def count(self) -> int:
+        """快照总数"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM exchange_rates").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TimedDB:
+    """统计 save_rates_many 的调用次数、快照数和耗时，其余方法直接转发"""
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.snapshots = 0
+        self.seconds = 0.0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._db, name)
+
+    def save_rates_many(self, snapshots: List[Dict[str, Any]], *args, **kwargs) -> bool:
+        started = time.perf_counter()
+        try:
+            return self._db.save_rates_many(snapshots, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.calls += 1
+                self.snapshots += len(snapshots)
+                self.seconds += elapsed
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.snapshots = 0
+            self.seconds = 0.0
@@ -0,0 +1,215 @@
+"""
+模拟汇率接口的本地 HTTP 服务。
+
+同一个服务同时提供 Currencyapi(/v3/...) 和 ExchangeRate-API(/v6/...) 两种响应格式，
+可配置响应延迟、错误率和每份快照的币种数量。
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import product
+from string import ascii_uppercase
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_currencies(count: int, base_currency: str = 'USD') -> List[str]:
+    """
+    生成固定顺序的币种代码
+
+    Args:
+        count: 币种数量(包含基础货币)
+        base_currency: 基础货币
+    """
+    codes = [base_currency]
+    for letters in product(ascii_uppercase, repeat=3):
+        if len(codes) >= count:
+            break
+        code = ''.join(letters)
+        if code != base_currency:
+            codes.append(code)
+    return codes
+
+
+class StubConfig:
+    """模拟服务配置"""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 currencies: int = 170, range_supported: bool = True, seed: int = 0):
+        """
+        Args:
+            latency: 每个请求的基础延迟(秒)
+            jitter: 在基础延迟上叠加的 0~jitter 秒随机延迟
+            error_rate: 返回 500 的概率
+            currencies: 每份快照的币种数量
+            range_supported: Currencyapi range 接口是否可用，不可用时返回 403，提供方回退为逐日请求
+            seed: 随机数种子
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.currencies = currencies
+        self.range_supported = range_supported
+        self.seed = seed
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """按路径分发到两种接口格式"""
+
+    server: 'StubServer'
+
+    def do_GET(self) -> None:
+        config = self.server.config
+        self.server.count_request()
+        delay = config.latency + (self.server.random() * config.jitter if config.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if config.error_rate and self.server.random() < config.error_rate:
+            return self._send(500, {'message': 'stub error'})
+
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [part for part in url.path.split('/') if part]
+
+        if parts[:1] == ['v3']:
+            self._currencyapi(parts[1:], params)
+        elif parts[:1] == ['v6'] and len(parts) >= 4:
+            self._exchangerate_api(parts[2:])
+        else:
+            self._send(404, {'message': 'not found'})
+
+    def _currencyapi(self, parts: List[str], params: Dict[str, str]) -> None:
+        base = params.get('base_currency', 'USD')
+        endpoint = parts[0] if parts else ''
+        if endpoint == 'latest':
+            now = datetime.fromtimestamp(self.server.next_latest_timestamp(), timezone.utc)
+            self._send(200, {
+                'meta': {'last_updated_at': now.isoformat().replace('+00:00', 'Z')},
+                'data': {code: {'code': code, 'value': value}
+                         for code, value in self.server.rates(base, date.today(), now.timestamp()).items()}
+            })
+        elif endpoint == 'historical':
+            day = date.fromisoformat(params['date'])
+            self._send(200, {
+                'meta': {'last_updated_at': f"{day.isoformat()}T23:59:59Z"},
+                'data': {code: {'code': code, 'value': value} for code, value in self.server.rates(base, day).items()}
+            })
+        elif endpoint == 'range':
+            if not self.server.config.range_supported:
+                return self._send(403, {'message': 'range endpoint not available on this plan'})
+            start = date.fromisoformat(params['datetime_start'][:10])
+            end = date.fromisoformat(params['datetime_end'][:10])
+            items = []
+            day = start
+            while day <= end:
+                items.append({
+                    'datetime': f"{day.isoformat()}T23:59:59Z",
+                    'currencies': {code: {'code': code, 'value': value}
+                                   for code, value in self.server.rates(base, day).items()}
+                })
+                day += timedelta(days=1)
+            self._send(200, {'data': items})
+        else:
+            self._send(404, {'message': 'not found'})
+
+    def _exchangerate_api(self, parts: List[str]) -> None:
+        endpoint, base = parts[0], parts[1]
+        if endpoint == 'latest':
+            now = self.server.next_latest_timestamp()
+            self._send(200, {
+                'result': 'success',
+                'base_code': base,
+                'time_last_update_unix': now,
+                # 不晚于当前时间，避免提供方跳过下一次请求
+                'time_next_update_unix': int(time.time()),
+                'conversion_rates': self.server.rates(base, date.today(), now)
+            })
+        elif endpoint == 'history' and len(parts) == 5:
+            day = date(int(parts[2]), int(parts[3]), int(parts[4]))
+            self._send(200, {
+                'result': 'success',
+                'base_code': base,
+                'year': day.year,
+                'month': day.month,
+                'day': day.day,
+                'conversion_rates': self.server.rates(base, day)
+            })
+        else:
+            self._send(404, {'result': 'error', 'error-type': 'unsupported-code'})
+
+    def _send(self, status: int, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """在后台线程运行的模拟接口服务"""
+
+    daemon_threads = True
+    # 并发回填时的连接数可能超过默认的 5
+    request_queue_size = 128
+
+    def __init__(self, config: Optional[StubConfig] = None, address: Tuple[str, int] = ('127.0.0.1', 0)):
+        self.config = config or StubConfig()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(self.config.seed)
+        self._codes = make_currencies(self.config.currencies)
+        self._latest_timestamp = int(time.time())
+        self._thread: Optional[threading.Thread] = None
+        super().__init__(address, StubRequestHandler)
+
+    @property
+    def url(self) -> str:
+        """服务根地址"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def next_latest_timestamp(self) -> int:
+        """最新汇率的更新时间，每次请求递增1秒，保证每次同步都拿到新数据"""
+        with self._lock:
+            self._latest_timestamp += 1
+            return self._latest_timestamp
+
+    def rates(self, base_currency: str, day: date, salt: float = 0.0) -> Dict[str, float]:
+        """
+        生成某天的汇率，同一天同一 salt 的结果固定
+
+        Args:
+            base_currency: 基础货币
+            day: 日期
+            salt: 附加的随机种子，最新汇率传入时间戳使每次结果不同
+        """
+        rng = random.Random(f"{base_currency}:{day.isoformat()}:{salt}")
+        codes = self._codes if base_currency in self._codes else [base_currency] + self._codes[1:]
+        return {code: 1.0 if code == base_currency else round(rng.uniform(0.01, 20000.0), 6) for code in codes}
+
+    def start(self) -> 'StubServer':
+        """在后台线程启动服务"""
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """停止服务"""
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,220 @@
+"""
+历史汇率本地缓存模块。
+
+历史汇率发布后不会再变化，按 (提供方, 基础货币, 日期) 缓存在单个 SQLite 文件中，
+重复回填同一日期时不再请求提供方。最新汇率和当天及以后的日期不缓存。
+"""
+
+import os
+import json
+import asyncio
+import sqlite3
+import threading
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from currency_sync.utils.dates import date_range, contiguous_ranges
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('cache')
+
+DEFAULT_CACHE_PATH = Path(__file__).parent.parent / 'cache' / 'historical_rates.sqlite3'
+
+
+class HistoricalRateCache:
+    """基于 SQLite 的历史汇率缓存，可在多个线程间共享"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化缓存
+
+        Args:
+            path: 缓存文件路径，默认读取环境变量 RATE_CACHE_PATH
+        """
+        self.path = Path(path or os.getenv('RATE_CACHE_PATH') or DEFAULT_CACHE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS historical_rates (
+                provider TEXT NOT NULL,
+                base_currency TEXT NOT NULL,
+                rate_date TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (provider, base_currency, rate_date)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def get_many(self, provider: str, base_currency: str, start_date: date, end_date: date) -> Dict[date, Dict[str, Any]]:
+        """
+        读取一段日期内已缓存的汇率数据
+
+        Args:
+            provider: 提供方名称
+            base_currency: 基础货币
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+
+        Returns:
+            Dict[date, Dict[str, Any]]: {日期: 汇率数据}，格式同 fetch_rates 的返回值
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rate_date, payload FROM historical_rates "
+                "WHERE provider = ? AND base_currency = ? AND rate_date BETWEEN ? AND ?",
+                (provider, base_currency, start_date.isoformat(), end_date.isoformat())
+            ).fetchall()
+        return {date.fromisoformat(rate_date): self._decode(payload) for rate_date, payload in rows}
+
+    def put_many(self, provider: str, base_currency: str, payloads: Iterable[Dict[str, Any]]) -> None:
+        """
+        写入汇率数据，只缓存今天之前的日期
+
+        Args:
+            provider: 提供方名称
+            base_currency: 基础货币
+            payloads: 汇率数据，格式同 fetch_rates 的返回值
+        """
+        today = date.today()
+        rows = [
+            (provider, base_currency, rate_data['data_updated_at'].date().isoformat(), self._encode(rate_data))
+            for rate_data in payloads
+            if rate_data['data_updated_at'].date() < today
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO historical_rates VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        """关闭缓存文件"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _encode(rate_data: Dict[str, Any]) -> bytes:
+        """压缩序列化汇率数据"""
+        return zlib.compress(json.dumps({
+            'currencies': rate_data['currencies'],
+            'data_updated_at': rate_data['data_updated_at'].isoformat(),
+            'data_provider': rate_data['data_provider']
+        }, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def _decode(payload: bytes) -> Dict[str, Any]:
+        """反序列化汇率数据"""
+        rate_data = json.loads(zlib.decompress(payload))
+        rate_data['data_updated_at'] = datetime.fromisoformat(rate_data['data_updated_at'])
+        return rate_data
+
+
+class CachedProvider:
+    """为提供方的历史汇率请求加上本地缓存，其余属性和方法直接转发给原提供方"""
+
+    def __init__(self, provider, cache: HistoricalRateCache):
+        """
+        初始化缓存代理
+
+        Args:
+            provider: 被包装的 ExchangeRateProvider
+            cache: 历史汇率缓存
+        """
+        self._provider = provider
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._provider, name)
+
+    def fetch_rates(self, target_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取汇率数据，历史日期优先读取缓存
+
+        Args:
+            target_date: 目标日期，如果为None则获取最新汇率
+        """
+        if target_date is None:
+            return self._provider.fetch_rates()
+
+        cached = self.cache.get_many(self.name, self.base_currency, target_date, target_date)
+        if target_date in cached:
+            logger.info(f"{self.name} {target_date.isoformat()} 历史汇率命中本地缓存")
+            return cached[target_date]
+
+        rate_data = self._provider.fetch_rates(target_date)
+        if rate_data:
+            self.cache.put_many(self.name, self.base_currency, [rate_data])
+        return rate_data
+
+    def fetch_rates_range(self, start_date: date, end_date: date, concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        批量获取历史汇率数据，只请求缓存中缺失的日期
+
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 提供方逐日请求时的并发数
+        """
+        results = self.cache.get_many(self.name, self.base_currency, start_date, end_date)
+        missing = [target_date for target_date in date_range(start_date, end_date) if target_date not in results]
+        logger.info(f"{self.name} {start_date.isoformat()} 至 {end_date.isoformat()} 缓存命中 {len(results)} 天，"
+                    f"需请求 {len(missing)} 天")
+
+        for run_start, run_end in contiguous_ranges(missing):
+            payloads = self._provider.fetch_rates_range(run_start, run_end, concurrency)
+            self.cache.put_many(self.name, self.base_currency, payloads)
+            for rate_data in payloads:
+                results[rate_data['data_updated_at'].date()] = rate_data
+
+        return [results[target_date] for target_date in sorted(results)]
+
+    async def fetch_rates_async(self, target_date: Optional[date] = None, session=None) -> Optional[Dict[str, Any]]:
+        """
+        异步获取汇率数据，历史日期优先读取缓存
+
+        Args:
+            target_date: 目标日期，如果为None则获取最新汇率
+            session: 共享的 aiohttp 会话
+        """
+        if target_date is None:
+            return await self._provider.fetch_rates_async(None, session)
+
+        cached = self.cache.get_many(self.name, self.base_currency, target_date, target_date)
+        if target_date in cached:
+            logger.info(f"{self.name} {target_date.isoformat()} 历史汇率命中本地缓存")
+            return cached[target_date]
+
+        rate_data = await self._provider.fetch_rates_async(target_date, session)
+        if rate_data:
+            self.cache.put_many(self.name, self.base_currency, [rate_data])
+        return rate_data
+
+    async def fetch_rates_range_async(self, start_date: date, end_date: date, concurrency: int = 4,
+                                      session=None) -> List[Dict[str, Any]]:
+        """
+        异步批量获取历史汇率数据，只请求缓存中缺失的日期，各缺失区间并发请求
+
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 提供方逐日请求时的并发数
+            session: 共享的 aiohttp 会话
+        """
+        results = self.cache.get_many(self.name, self.base_currency, start_date, end_date)
+        missing = [target_date for target_date in date_range(start_date, end_date) if target_date not in results]
+        logger.info(f"{self.name} {start_date.isoformat()} 至 {end_date.isoformat()} 缓存命中 {len(results)} 天，"
+                    f"需请求 {len(missing)} 天")
+
+        chunks = await asyncio.gather(*(
+            self._provider.fetch_rates_range_async(run_start, run_end, concurrency, session)
+            for run_start, run_end in contiguous_ranges(missing)
+        ))
+        for payloads in chunks:
+            self.cache.put_many(self.name, self.base_currency, payloads)
+            for rate_data in payloads:
+                results[rate_data['data_updated_at'].date()] = rate_data
+
+        return [results[target_date] for target_date in sorted(results)]
@@ -0,0 +1,56 @@
+"""
+交叉汇率计算模块。
+
+由一份以某基础货币报价的汇率快照推导出以其他货币为基础货币的汇率，
+不需要为每个基础货币单独请求提供方。
+"""
+
+from typing import Dict, Iterable
+
+import numpy as np
+
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('cross_rates')
+
+
+def derive_cross_rates(currencies: Dict[str, float], base_currency: str,
+                       target_bases: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    """
+    推导以目标货币为基础货币的汇率
+
+    设 r 为1单位基础货币可兑换的各币种数量，则 r ⊗ (1 / r) 的第 j 列
+    就是1单位币种 j 可兑换的各币种数量。只计算目标货币对应的列。
+
+    Args:
+        currencies: 以 base_currency 为基础货币的汇率
+        base_currency: 快照的基础货币
+        target_bases: 需要推导的基础货币
+
+    Returns:
+        Dict[str, Dict[str, float]]: {基础货币: 汇率数据}，快照中不存在的目标货币被跳过
+    """
+    codes = sorted(set(currencies) | {base_currency})
+    index = {code: i for i, code in enumerate(codes)}
+    rates = np.array([1.0 if code == base_currency else (currencies.get(code) or np.nan) for code in codes],
+                     dtype=np.float64)
+
+    targets = []
+    for target in dict.fromkeys(target_bases):
+        if target in index and np.isfinite(rates[index[target]]):
+            targets.append(target)
+        else:
+            logger.warning(f"{base_currency} 汇率快照中没有 {target}，无法推导以 {target} 为基础货币的汇率")
+    if not targets:
+        return {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        matrix = np.outer(rates, 1.0 / rates[[index[target] for target in targets]])
+
+    results = {}
+    for column, target in enumerate(targets):
+        values = matrix[:, column]
+        valid = np.isfinite(values)
+        results[target] = dict(zip(np.asarray(codes)[valid].tolist(), values[valid].tolist()))
+        results[target][target] = 1.0
+    return results
@@ -0,0 +1,119 @@
+"""
+常驻同步服务模块。
+
+在一个进程内保持提供方会话、数据库连接池和本地缓存，用 asyncio 定时执行
+最新汇率同步和近期缺失日期的补齐，并在每次任务后更新指标文件。
+"""
+
+import asyncio
+import signal
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+from currency_sync.metrics import SyncMetrics
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('daemon')
+
+# 分区维护间隔(秒)
+PARTITION_INTERVAL = 86400
+
+
+class SyncDaemon:
+    """定时同步服务"""
+
+    def __init__(self, synchronizer, interval: float, gap_interval: float, gap_days: int,
+                 concurrency: int = 4, metrics_path: Optional[str] = None, maintain_partitions: bool = False):
+        """
+        初始化同步服务
+
+        Args:
+            synchronizer: ExchangeRateSynchronizer 实例，在整个服务生命周期内复用
+            interval: 最新汇率同步间隔(秒)
+            gap_interval: 缺失日期补齐间隔(秒)
+            gap_days: 每次补齐检查最近多少天(不含今天)
+            concurrency: 补齐时提供方逐日请求的并发数
+            metrics_path: 指标文件路径，默认读取环境变量 METRICS_PATH
+            maintain_partitions: 是否每天维护一次 exchange_rates 的月分区
+        """
+        self.synchronizer = synchronizer
+        self.interval = interval
+        self.gap_interval = gap_interval
+        self.gap_days = gap_days
+        self.concurrency = concurrency
+        self.metrics_path = metrics_path
+        self.maintain_partitions = maintain_partitions
+        self.metrics = SyncMetrics()
+        self.synchronizer.stats.add_observer(self.metrics.observe_request)
+        self._stop: Optional[asyncio.Event] = None
+
+    def run(self) -> None:
+        """运行服务，直到收到 SIGINT/SIGTERM"""
+        asyncio.run(self._main())
+
+    async def _main(self) -> None:
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except NotImplementedError:
+                pass
+
+        logger.info(f"同步服务启动，最新汇率间隔 {self.interval:.0f}s，"
+                    f"补齐间隔 {self.gap_interval:.0f}s，检查最近 {self.gap_days} 天的缺失日期")
+        jobs = [
+            self._every(self.interval, 'latest', self._sync_latest),
+            self._every(self.gap_interval, 'gap_fill', self._fill_gaps)
+        ]
+        if self.maintain_partitions:
+            jobs.append(self._every(PARTITION_INTERVAL, 'partitions', self._maintain_partitions))
+        await asyncio.gather(*jobs)
+        logger.info("同步服务已停止")
+
+    async def _every(self, interval: float, kind: str, job) -> None:
+        """
+        按固定间隔执行任务，任务耗时从间隔中扣除
+
+        Args:
+            interval: 间隔(秒)
+            kind: 任务类型，用于日志和指标
+            job: 同步执行的任务函数，返回是否成功
+        """
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                # 同步任务放到线程中执行，不阻塞事件循环上的其他定时任务
+                success = await asyncio.to_thread(job)
+            except Exception as e:
+                logger.error(f"{kind} 任务执行出错: {str(e)}")
+                success = False
+            duration = time.monotonic() - started
+
+            self.metrics.observe_run(kind, duration, success)
+            self.metrics.write(self.metrics_path)
+            self.synchronizer.stats.save()
+            logger.info(f"{kind} 任务{'成功' if success else '失败'}，耗时 {duration:.2f}s")
+
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, interval - duration))
+            except asyncio.TimeoutError:
+                pass
+
+    def _sync_latest(self) -> bool:
+        """同步最新汇率"""
+        return self.synchronizer.sync_date(None)
+
+    def _fill_gaps(self) -> bool:
+        """检测并补齐最近若干天缺失的历史汇率"""
+        if self.gap_days <= 0:
+            return True
+        results = self.synchronizer.catch_up(date.today() - timedelta(days=self.gap_days),
+                                             concurrency=self.concurrency)
+        return all(results.values())
+
+    def _maintain_partitions(self) -> bool:
+        """创建未来月份的分区并清理超出保留期的分区，参数读取环境变量"""
+        self.synchronizer.db.maintain_partitions()
+        return True
@@ -0,0 +1,9 @@
+"""
+数据库访问模块。
+"""
+
+from currency_sync.db.database import ExchangeRateDB
+
+__all__ = [
+    'ExchangeRateDB',
+]
@@ -4,8 +4,34 @@ CREATE TABLE exchange_rates (
     currencies JSON NOT NULL COMMENT '汇率数据集合(JSON格式)',
     data_provider VARCHAR(32) NOT NULL COMMENT '数据来源',
     data_updated_at TIMESTAMP NOT NULL COMMENT '汇率生效时间',
+    snapshot_type ENUM('full', 'delta') NOT NULL DEFAULT 'full' COMMENT '快照类型: full 为完整关键帧，delta 只包含相对关键帧变化的币种',
+    keyframe_id INT UNSIGNED NULL COMMENT '差量快照所属关键帧的ID，完整快照为NULL',
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
     
     PRIMARY KEY (id),
-    INDEX idx_data_updated_at (data_updated_at)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='JSON格式汇率缓存表';
\ No newline at end of file
+    UNIQUE KEY uk_base_provider_updated_at (base_currency, data_provider, data_updated_at),
+    INDEX idx_data_updated_at (data_updated_at),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_keyframe_id (keyframe_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='JSON格式汇率缓存表';
+
+-- 已有表升级(批量写入的 upsert 依赖该唯一键，执行前需先清理重复数据):
+-- ALTER TABLE exchange_rates ADD UNIQUE KEY uk_base_provider_updated_at (base_currency, data_provider, data_updated_at);
+-- 查询服务按写入时间增量刷新依赖 idx_updated_at:
+-- ALTER TABLE exchange_rates ADD INDEX idx_updated_at (updated_at);
+-- 差量存储(SNAPSHOT_KEYFRAME_INTERVAL)依赖以下列:
+-- ALTER TABLE exchange_rates
+--     ADD COLUMN snapshot_type ENUM('full', 'delta') NOT NULL DEFAULT 'full' AFTER data_updated_at,
+--     ADD COLUMN keyframe_id INT UNSIGNED NULL AFTER snapshot_type,
+--     ADD INDEX idx_keyframe_id (keyframe_id);
+
+CREATE TABLE exchange_rate_points (
+    base_currency CHAR(3) NOT NULL COMMENT '基础货币(ISO 4217代码)',
+    quote_currency CHAR(3) NOT NULL COMMENT '报价货币(ISO 4217代码)',
+    rate_date DATE NOT NULL COMMENT '汇率日期',
+    rate DOUBLE NOT NULL COMMENT '1单位基础货币可兑换的报价货币数量',
+    data_provider VARCHAR(32) NOT NULL COMMENT '数据来源',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+
+    PRIMARY KEY (base_currency, quote_currency, rate_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='按币种拆分的每日汇率表，同一天以最后写入的快照为准';
@@ -0,0 +1,37 @@
+-- exchange_rates 按月分区的表结构，可替代 currency.sql 中的同名表
+--
+-- 按 data_updated_at 所在月份 RANGE 分区，按日期范围查询时 MySQL 只扫描涉及的分区。
+-- 分区键必须包含在主键和所有唯一键中，因此主键为 (id, data_updated_at)。
+-- 未来月份的分区和超出保留期的分区由 ExchangeRateDB.maintain_partitions
+-- (命令行 currency_sync partitions 或 serve --maintain-partitions) 维护，
+-- pmax 兜底接收尚未建分区的月份，新分区通过拆分 pmax 创建。
+
+CREATE TABLE exchange_rates (
+    id INT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+    base_currency CHAR(3) NOT NULL COMMENT '基础货币(ISO 4217代码)',
+    currencies JSON NOT NULL COMMENT '汇率数据集合(JSON格式)',
+    data_provider VARCHAR(32) NOT NULL COMMENT '数据来源',
+    data_updated_at TIMESTAMP NOT NULL COMMENT '汇率生效时间',
+    snapshot_type ENUM('full', 'delta') NOT NULL DEFAULT 'full' COMMENT '快照类型: full 为完整关键帧，delta 只包含相对关键帧变化的币种',
+    keyframe_id INT UNSIGNED NULL COMMENT '差量快照所属关键帧的ID，完整快照为NULL',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+
+    PRIMARY KEY (id, data_updated_at),
+    UNIQUE KEY uk_base_provider_updated_at (base_currency, data_provider, data_updated_at),
+    INDEX idx_data_updated_at (data_updated_at),
+    INDEX idx_updated_at (updated_at),
+    INDEX idx_keyframe_id (keyframe_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='JSON格式汇率缓存表(按月分区)'
+PARTITION BY RANGE (UNIX_TIMESTAMP(data_updated_at)) (
+    PARTITION p202501 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')),
+    PARTITION pmax VALUES LESS THAN MAXVALUE
+);
+
+-- 已有的未分区表迁移(会重建整张表，数据量大时在低峰期执行):
+-- ALTER TABLE exchange_rates DROP PRIMARY KEY, ADD PRIMARY KEY (id, data_updated_at);
+-- ALTER TABLE exchange_rates PARTITION BY RANGE (UNIX_TIMESTAMP(data_updated_at)) (
+--     PARTITION p202501 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')),
+--     PARTITION pmax VALUES LESS THAN MAXVALUE
+-- );
+-- 早于 2025-01 的数据都落在第一个分区中，按保留期清理时随该分区一起处理；
+-- 之后执行 currency_sync partitions，拆分 pmax 补建到未来几个月为止的月分区。
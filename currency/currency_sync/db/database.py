@@ -4,19 +4,68 @@
 
 import os
 import json
-import mysql.connector
-from datetime import datetime
-from typing import Dict, Any, Optional
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, date, timedelta
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+
+from mysql.connector import pooling
 
 from currency_sync.utils.logger import setup_logger
 
 logger = setup_logger('database')
 
+def encode_delta(keyframe: Dict[str, float], currencies: Dict[str, float]) -> Dict[str, Optional[float]]:
+    """
+    计算快照相对关键帧的差量
+    
+    Args:
+        keyframe: 关键帧的汇率数据
+        currencies: 完整的汇率数据
+    
+    Returns:
+        Dict[str, Optional[float]]: 变化的币种及新汇率，关键帧中有而快照中没有的币种记为None
+    """
+    delta: Dict[str, Optional[float]] = {
+        currency: rate for currency, rate in currencies.items() if keyframe.get(currency) != rate
+    }
+    delta.update({currency: None for currency in keyframe if currency not in currencies})
+    return delta
+
+def apply_delta(keyframe: Dict[str, float], delta: Dict[str, Optional[float]]) -> Dict[str, float]:
+    """
+    由关键帧和差量还原完整的汇率数据
+    
+    Args:
+        keyframe: 关键帧的汇率数据
+        delta: encode_delta 的结果
+    
+    Returns:
+        Dict[str, float]: 完整的汇率数据
+    """
+    currencies = dict(keyframe)
+    for currency, rate in delta.items():
+        if rate is None:
+            currencies.pop(currency, None)
+        else:
+            currencies[currency] = rate
+    return currencies
+
 class ExchangeRateDB:
     """汇率数据库操作类"""
     
-    def __init__(self, config=None):
-        """初始化数据库连接配置"""
+    def __init__(self, config=None, pool_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 keyframe_interval: Optional[int] = None):
+        """
+        初始化数据库连接配置
+
+        Args:
+            config: 数据库连接配置，默认从环境变量读取
+            pool_size: 连接池大小，默认读取环境变量 DB_POOL_SIZE
+            batch_size: 批量写入时每批的行数，默认读取环境变量 DB_BATCH_SIZE
+            keyframe_interval: 差量存储模式下每多少份快照写一次完整关键帧，其余只写相对关键帧变化的币种；
+                默认读取环境变量 SNAPSHOT_KEYFRAME_INTERVAL，0或1表示总是写完整快照
+        """
         self.config = config or {
             'host': os.getenv('DB_HOST', 'localhost'),
             'user': os.getenv('DB_USER', 'root'),
@@ -24,53 +73,751 @@ class ExchangeRateDB:
             'database': os.getenv('DB_NAME', 'currency_db'),
             'port': int(os.getenv('DB_PORT', '3306'))
         }
-        self.conn = None
-        self.cursor = None
+        self.pool_size = pool_size or int(os.getenv('DB_POOL_SIZE', '4'))
+        self.batch_size = batch_size or int(os.getenv('DB_BATCH_SIZE', '500'))
+        self.keyframe_interval = (keyframe_interval if keyframe_interval is not None
+                                  else int(os.getenv('SNAPSHOT_KEYFRAME_INTERVAL', '0')))
+        # 差量存储模式下每个 (基础货币, 提供方) 最新一段关键帧的状态，首次写入时从数据库中最近一段关键帧恢复
+        self._delta_state: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._delta_lock = threading.Lock()
+        # exchange_rates 是否已添加差量存储列(snapshot_type、keyframe_id)，首次访问时检测，
+        # 未升级的旧表在默认的完整快照模式下照常读写，不涉及这两列
+        self._delta_columns: Optional[bool] = None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # 连接池耗尽时 get_connection 会直接抛错，用信号量让调用方排队等待
+        self._slots = threading.BoundedSemaphore(self.pool_size)
     
     def connect(self) -> bool:
-        """连接到数据库"""
-        try:
-            self.conn = mysql.connector.connect(**self.config)
-            self.cursor = self.conn.cursor()
-            return True
-        except Exception as e:
-            logger.error(f"数据库连接失败: {str(e)}")
-            return False
+        """创建连接池，进程生命周期内只创建一次"""
+        with self._pool_lock:
+            if self._pool is not None:
+                return True
+            try:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name=f"currency_sync_{id(self)}",
+                    pool_size=self.pool_size,
+                    **self.config
+                )
+                return True
+            except Exception as e:
+                logger.error(f"数据库连接失败: {str(e)}")
+                return False
+    
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """从连接池借出一个连接，退出上下文时归还"""
+        if not self.connect():
+            raise ConnectionError("数据库连接失败")
+        
+        with self._slots:
+            conn = self._pool.get_connection()
+            try:
+                yield conn
+            finally:
+                # 池化连接的 close() 只是归还到连接池
+                conn.close()
     
     def close(self) -> None:
-        """关闭数据库连接"""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        """关闭连接池中的所有连接"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool._remove_connections()
+                self._pool = None
     
     def save_rates(self, base_currency: str, currencies: Dict[str, float], 
                   provider: str, updated_at: datetime) -> bool:
         """保存汇率数据到数据库"""
+        return self.save_rates_many([{
+            'currencies': currencies,
+            'data_provider': provider,
+            'data_updated_at': updated_at
+        }], base_currency)
+    
+    def save_rates_many(self, snapshots: List[Dict[str, Any]], base_currency: Optional[str] = None,
+                        batch_size: Optional[int] = None, upsert: bool = True) -> bool:
+        """
+        在一个事务中批量保存多份汇率数据
+        
+        Args:
+            snapshots: 汇率数据列表，格式同 fetch_rates 的返回值，可额外包含 base_currency 字段
+            base_currency: 快照未包含 base_currency 时使用的基础货币
+            batch_size: 每批 executemany 的行数，默认使用实例配置
+            upsert: 是否在 (base_currency, data_provider, data_updated_at) 重复时覆盖汇率数据
+        
+        Returns:
+            bool: 是否全部保存成功，失败时整个事务回滚
+        """
+        if not snapshots:
+            return True
+        
+        rows = [
+            (
+                snapshot.get('base_currency', base_currency),
+                json.dumps(snapshot['currencies']),
+                snapshot['data_provider'],
+                snapshot['data_updated_at']
+            )
+            for snapshot in snapshots
+        ]
+        point_rows = [
+            point
+            for snapshot in snapshots
+            for point in self._point_rows(
+                snapshot.get('base_currency', base_currency),
+                snapshot['currencies'],
+                snapshot['data_provider'],
+                snapshot['data_updated_at']
+            )
+        ]
+        batch_size = batch_size or self.batch_size
+        delta_mode = self.keyframe_interval > 1
+        state = None
+        
         try:
-            if not self.connect():
-                return False
-                
-            # 将汇率数据转换为JSON字符串
-            currencies_json = json.dumps(currencies)
+            # 差量模式下关键帧状态依赖写入顺序，同一时间只允许一个写入
+            with self._delta_lock if delta_mode else nullcontext():
+                with self.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        delta_columns = self._has_delta_columns(cursor)
+                        if delta_mode and delta_columns:
+                            state = self._write_delta_encoded(cursor, snapshots, base_currency, upsert, batch_size)
+                        else:
+                            sql = self._full_insert_sql(upsert, delta_columns)
+                            for i in range(0, len(rows), batch_size):
+                                cursor.executemany(sql, rows[i:i + batch_size])
+                        # 按币种拆分的汇率与快照在同一事务中写入
+                        self._write_points(cursor, point_rows, batch_size)
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    finally:
+                        cursor.close()
+                # 事务提交后才更新关键帧状态
+                if state is not None:
+                    self._delta_state = state
             
-            # 准备SQL语句
+            providers = sorted({row[2] for row in rows})
+            logger.info(f"成功保存{', '.join(providers)}的 {len(rows)} 条汇率数据")
+            return True
+        except Exception as e:
+            logger.error(f"保存汇率数据失败: {str(e)}")
+            return False
+
+    @staticmethod
+    def _full_insert_sql(upsert: bool, delta_columns: bool) -> str:
+        """完整快照的写入语句，有差量存储列时标记为关键帧，覆盖已有的差量行"""
+        if not delta_columns:
             sql = """
             INSERT INTO exchange_rates 
             (base_currency, currencies, data_provider, data_updated_at) 
             VALUES (%s, %s, %s, %s)
             """
+            return sql + (" ON DUPLICATE KEY UPDATE currencies = VALUES(currencies)" if upsert else "")
+        
+        sql = """
+        INSERT INTO exchange_rates 
+        (base_currency, currencies, data_provider, data_updated_at, snapshot_type, keyframe_id) 
+        VALUES (%s, %s, %s, %s, 'full', NULL)
+        """
+        if upsert:
+            sql += (" ON DUPLICATE KEY UPDATE currencies = VALUES(currencies), "
+                    "snapshot_type = VALUES(snapshot_type), keyframe_id = VALUES(keyframe_id)")
+        return sql
+
+    def _has_delta_columns(self, cursor) -> bool:
+        """exchange_rates 是否已有差量存储列，结果在进程内缓存"""
+        if self._delta_columns is None:
+            cursor.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'exchange_rates'
+                AND COLUMN_NAME IN ('snapshot_type', 'keyframe_id')
+            """)
+            self._delta_columns = cursor.fetchone()[0] == 2
+            if not self._delta_columns and self.keyframe_interval > 1:
+                logger.warning("exchange_rates 缺少 snapshot_type/keyframe_id 列(见 currency.sql 中的升级语句)，"
+                               "差量存储不生效，仍写入完整快照")
+        return self._delta_columns
+
+    def _keyframe_column(self, cursor) -> str:
+        """查询快照时 keyframe_id 列的写法，旧表没有该列时固定为NULL"""
+        return 'keyframe_id' if self._has_delta_columns(cursor) else 'NULL AS keyframe_id'
+
+    def _write_delta_encoded(self, cursor, snapshots: List[Dict[str, Any]], base_currency: Optional[str],
+                             upsert: bool, batch_size: int) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """
+        按差量模式写入快照
+        
+        差量记录的是相对所属关键帧(keyframe_id)的变化而不是相对上一份快照，
+        回填等乱序写入的快照不会影响已有差量的还原。只有晚于当前关键帧段最后一份快照的数据
+        才写为差量，其余情况、关键帧段已满或差量超过一半币种时写完整关键帧。
+        本进程还没有某个 (基础货币, 提供方) 的关键帧状态时先从数据库恢复，
+        每次运行只同步一次的部署方式下差量编码同样生效。
+        
+        Returns:
+            Dict[Tuple[str, str], Dict[str, Any]]: 写入后的关键帧状态，由调用方在提交后生效
+        """
+        state = {key: dict(value) for key, value in self._delta_state.items()}
+        keyframe_sql = """
+        INSERT INTO exchange_rates 
+        (base_currency, currencies, data_provider, data_updated_at, snapshot_type, keyframe_id) 
+        VALUES (%s, %s, %s, %s, 'full', NULL)
+        """
+        delta_sql = """
+        INSERT INTO exchange_rates 
+        (base_currency, currencies, data_provider, data_updated_at, snapshot_type, keyframe_id) 
+        VALUES (%s, %s, %s, %s, 'delta', %s)
+        """
+        if upsert:
+            # 覆盖已有行时让 lastrowid 返回已有行的ID
+            keyframe_sql += (" ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id), currencies = VALUES(currencies), "
+                             "snapshot_type = VALUES(snapshot_type), keyframe_id = VALUES(keyframe_id)")
+            delta_sql += (" ON DUPLICATE KEY UPDATE currencies = VALUES(currencies), "
+                          "snapshot_type = VALUES(snapshot_type), keyframe_id = VALUES(keyframe_id)")
+        
+        delta_rows = []
+        for snapshot in sorted(snapshots, key=lambda item: item['data_updated_at']):
+            base = snapshot.get('base_currency', base_currency)
+            provider = snapshot['data_provider']
+            updated_at = snapshot['data_updated_at']
+            currencies = snapshot['currencies']
+            if (base, provider) not in state:
+                loaded = self._load_delta_state(cursor, base, provider)
+                if loaded:
+                    state[(base, provider)] = loaded
+            current = state.get((base, provider))
+            # 数据库返回的时间不带时区，比较时统一去掉时区
+            moment = updated_at.replace(tzinfo=None)
+            appending = current is None or moment > current['data_updated_at']
             
-            # 执行SQL
-            self.cursor.execute(sql, (base_currency, currencies_json, provider, updated_at))
-            self.conn.commit()
+            delta = None
+            # 差量不跨月引用关键帧，按月分区时删除或归档旧分区不会影响后续分区的还原
+            same_month = current and (current['keyframe_at'].year, current['keyframe_at'].month) == \
+                (moment.year, moment.month)
+            if same_month and appending and current['count'] < self.keyframe_interval:
+                delta = encode_delta(current['currencies'], currencies)
+                if len(delta) * 2 > len(currencies):
+                    delta = None
             
-            logger.info(f"成功保存{provider}的汇率数据")
-            return True
-        except Exception as e:
-            logger.error(f"保存汇率数据失败: {str(e)}")
-            if self.conn:
-                self.conn.rollback()
+            if delta is not None:
+                delta_rows.append((base, json.dumps(delta), provider, updated_at, current['keyframe_id']))
+                current['count'] += 1
+                current['data_updated_at'] = moment
+                continue
+            
+            cursor.execute(keyframe_sql, (base, json.dumps(currencies), provider, updated_at))
+            if appending:
+                state[(base, provider)] = {
+                    'keyframe_id': cursor.lastrowid,
+                    'keyframe_at': moment,
+                    'currencies': currencies,
+                    'data_updated_at': moment,
+                    'count': 1
+                }
+        
+        for i in range(0, len(delta_rows), batch_size):
+            cursor.executemany(delta_sql, delta_rows[i:i + batch_size])
+        return state
+
+    def _load_delta_state(self, cursor, base_currency: str, provider: str) -> Optional[Dict[str, Any]]:
+        """
+        从数据库恢复某个 (基础货币, 提供方) 最近一段关键帧的状态
+        
+        最近一份快照是完整快照时它就是当前关键帧，是差量时取它所属的关键帧；
+        段内快照数为关键帧本身加上引用它的差量数。
+        
+        Returns:
+            Optional[Dict[str, Any]]: 关键帧状态，没有任何快照时返回None
+        """
+        cursor.execute("""
+        SELECT id, currencies, data_updated_at, keyframe_id
+        FROM exchange_rates
+        WHERE base_currency = %s AND data_provider = %s
+        ORDER BY data_updated_at DESC
+        LIMIT 1
+        """, (base_currency, provider))
+        latest = cursor.fetchone()
+        if latest is None:
+            return None
+        
+        latest_id, currencies, latest_at, keyframe_id = latest
+        keyframe_at = latest_at
+        if keyframe_id is None:
+            keyframe_id = latest_id
+        else:
+            cursor.execute("SELECT currencies, data_updated_at FROM exchange_rates WHERE id = %s", (keyframe_id,))
+            keyframe = cursor.fetchone()
+            if keyframe is None:
+                return None
+            currencies, keyframe_at = keyframe
+        
+        cursor.execute("SELECT COUNT(*) FROM exchange_rates WHERE keyframe_id = %s", (keyframe_id,))
+        deltas = cursor.fetchone()[0]
+        return {
+            'keyframe_id': keyframe_id,
+            'keyframe_at': keyframe_at,
+            'currencies': json.loads(currencies),
+            'data_updated_at': latest_at,
+            'count': 1 + deltas
+        }
+
+    def _has_deltas(self, cursor) -> bool:
+        """表中是否有差量快照，走 idx_keyframe_id 只需一次索引查找"""
+        if not self._has_delta_columns(cursor):
             return False
-        finally:
-            self.close()
\ No newline at end of file
+        cursor.execute("SELECT 1 FROM exchange_rates WHERE keyframe_id IS NOT NULL LIMIT 1")
+        return cursor.fetchone() is not None
+    
+    def _load_keyframes(self, cursor, keyframe_ids: Iterable[int]) -> Dict[int, Dict[str, float]]:
+        """按ID批量读取关键帧的汇率数据"""
+        keyframe_ids = sorted(set(keyframe_ids))
+        keyframes = {}
+        for i in range(0, len(keyframe_ids), self.batch_size):
+            chunk = keyframe_ids[i:i + self.batch_size]
+            cursor.execute(
+                f"SELECT id, currencies FROM exchange_rates WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                tuple(chunk)
+            )
+            keyframes.update({keyframe_id: json.loads(currencies) for keyframe_id, currencies in cursor.fetchall()})
+        return keyframes
+    
+    @staticmethod
+    def _decode_currencies(currencies: str, keyframe_id: Optional[int],
+                           keyframes: Dict[int, Dict[str, float]]) -> Dict[str, float]:
+        """还原一行快照的完整汇率数据"""
+        currencies = json.loads(currencies)
+        if keyframe_id is None:
+            return currencies
+        return apply_delta(keyframes[keyframe_id], currencies)
+
+    def rebuild_points(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       page_size: int = 1000) -> int:
+        """
+        从 exchange_rates 的JSON快照重建 exchange_rate_points，用于补齐历史数据
+        
+        Args:
+            start_date: 开始日期(包含)，为None时不限制
+            end_date: 结束日期(包含)，为None时不限制
+            page_size: 每次按主键分页读取的快照数
+        
+        Returns:
+            int: 写入的汇率点数量
+        """
+        conditions, params = self._date_range_conditions(start_date, end_date)
+        
+        total = 0
+        last_id = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                sql = f"""
+                SELECT id, base_currency, currencies, data_provider, data_updated_at, {self._keyframe_column(cursor)}
+                FROM exchange_rates
+                WHERE id > %s{''.join(' AND ' + condition for condition in conditions)}
+                ORDER BY id
+                LIMIT %s
+                """
+                while True:
+                    cursor.execute(sql, (last_id, *params, page_size))
+                    snapshots = cursor.fetchall()
+                    if not snapshots:
+                        break
+                    
+                    keyframes = self._load_keyframes(
+                        cursor, [row[5] for row in snapshots if row[5] is not None])
+                    point_rows = []
+                    for _, base_currency, currencies, provider, updated_at, keyframe_id in snapshots:
+                        currencies = self._decode_currencies(currencies, keyframe_id, keyframes)
+                        point_rows.extend(self._point_rows(base_currency, currencies, provider, updated_at))
+                    self._write_points(cursor, point_rows, self.batch_size)
+                    conn.commit()
+                    
+                    total += len(point_rows)
+                    last_id = snapshots[-1][0]
+                    logger.info(f"已重建 {total} 个汇率点 (快照ID <= {last_id})")
+            finally:
+                cursor.close()
+        
+        return total
+    
+    def maintain_partitions(self, months_ahead: Optional[int] = None, retention_months: Optional[int] = None,
+                            archive: Optional[bool] = None) -> Dict[str, List[str]]:
+        """
+        维护按月分区的 exchange_rates(见 currency_partitioned.sql)，未分区的表直接跳过
+        
+        拆分 pmax 创建到当前月份之后 months_ahead 个月为止的分区；设置了保留期时，
+        整个月份都早于保留期的分区会被删除，或先归档到同结构的归档表 exchange_rates_pYYYYMM 再删除。
+        归档可以重复执行，中途失败后再次运行会继续完成。
+        
+        Args:
+            months_ahead: 提前创建的月份数，默认读取环境变量 PARTITION_MONTHS_AHEAD
+            retention_months: 保留的月份数(含当前月)，0表示不清理，默认读取环境变量 PARTITION_RETENTION_MONTHS
+            archive: 是否归档而不是直接删除过期分区，默认读取环境变量 PARTITION_ARCHIVE
+        
+        Returns:
+            Dict[str, List[str]]: created、archived、dropped 三类分区名
+        """
+        months_ahead = months_ahead if months_ahead is not None else int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+        retention_months = (retention_months if retention_months is not None
+                            else int(os.getenv('PARTITION_RETENTION_MONTHS', '0')))
+        archive = archive if archive is not None else os.getenv('PARTITION_ARCHIVE', '').lower() in ('1', 'true', 'yes')
+        summary: Dict[str, List[str]] = {'created': [], 'archived': [], 'dropped': []}
+        
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                SELECT PARTITION_NAME
+                FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'exchange_rates' AND PARTITION_NAME IS NOT NULL
+                ORDER BY PARTITION_ORDINAL_POSITION
+                """)
+                names = [row[0] for row in cursor.fetchall()]
+                if not names:
+                    logger.info("exchange_rates 未分区，跳过分区维护")
+                    return summary
+                
+                months = sorted(self._partition_month(name) for name in names if self._partition_month(name))
+                this_month = date.today().replace(day=1)
+                
+                # 创建未来月份的分区
+                wanted = []
+                month = self._add_months(months[-1], 1) if months else this_month
+                while month <= self._add_months(this_month, months_ahead):
+                    wanted.append(month)
+                    month = self._add_months(month, 1)
+                if wanted:
+                    definitions = ', '.join(
+                        f"PARTITION p{month:%Y%m} VALUES LESS THAN "
+                        f"(UNIX_TIMESTAMP('{self._add_months(month, 1).isoformat()} 00:00:00'))"
+                        for month in wanted
+                    )
+                    if 'pmax' in names:
+                        cursor.execute(f"ALTER TABLE exchange_rates REORGANIZE PARTITION pmax INTO "
+                                       f"({definitions}, PARTITION pmax VALUES LESS THAN MAXVALUE)")
+                    else:
+                        cursor.execute(f"ALTER TABLE exchange_rates ADD PARTITION ({definitions})")
+                    summary['created'] = [f"p{month:%Y%m}" for month in wanted]
+                    logger.info(f"已创建分区: {', '.join(summary['created'])}")
+                
+                # 清理超出保留期的分区，至少保留一个月分区
+                if retention_months > 0:
+                    cutoff = self._add_months(this_month, -(retention_months - 1))
+                    months += wanted
+                    expired = [month for month in months if month < cutoff][:max(0, len(months) - 1)]
+                    for month in expired:
+                        name = f"p{month:%Y%m}"
+                        if archive:
+                            archive_table = self._archive_partition(conn, cursor, name)
+                            summary['archived'].append(name)
+                            logger.info(f"分区 {name} 已归档到 {archive_table}")
+                        cursor.execute(f"ALTER TABLE exchange_rates DROP PARTITION {name}")
+                        summary['dropped'].append(name)
+                        logger.info(f"已删除分区 {name}")
+            finally:
+                cursor.close()
+        
+        return summary
+    
+    def _archive_partition(self, conn, cursor, name: str) -> str:
+        """
+        将一个分区的数据归档到 exchange_rates_<分区名>
+        
+        分区先交换到新建的空暂存表，再 INSERT IGNORE 到归档表，归档表已存在或已有数据时同样可以执行；
+        上一次运行在交换之后中断留下的暂存表会先并入归档表，数据不会丢失。
+        
+        Returns:
+            str: 归档表名
+        """
+        archive_table = f"exchange_rates_{name}"
+        staging_table = f"{archive_table}_staging"
+        
+        if not self._table_exists(cursor, archive_table):
+            self._create_unpartitioned_copy(cursor, archive_table)
+        
+        if self._table_exists(cursor, staging_table):
+            logger.info(f"发现上一次归档遗留的暂存表 {staging_table}，先并入归档表")
+            self._flush_staging(conn, cursor, staging_table, archive_table)
+        
+        # EXCHANGE PARTITION 要求目标表为空且未分区
+        self._create_unpartitioned_copy(cursor, staging_table)
+        cursor.execute(f"ALTER TABLE exchange_rates EXCHANGE PARTITION {name} WITH TABLE {staging_table}")
+        self._flush_staging(conn, cursor, staging_table, archive_table)
+        return archive_table
+    
+    @staticmethod
+    def _flush_staging(conn, cursor, staging_table: str, archive_table: str) -> None:
+        """将暂存表的数据并入归档表后删除暂存表，重复的行保留归档表中已有的"""
+        cursor.execute(f"INSERT IGNORE INTO {archive_table} SELECT * FROM {staging_table}")
+        conn.commit()
+        cursor.execute(f"DROP TABLE {staging_table}")
+    
+    @staticmethod
+    def _create_unpartitioned_copy(cursor, table: str) -> None:
+        """创建与 exchange_rates 结构相同但不分区的空表"""
+        cursor.execute(f"CREATE TABLE {table} LIKE exchange_rates")
+        cursor.execute(f"ALTER TABLE {table} REMOVE PARTITIONING")
+    
+    @staticmethod
+    def _table_exists(cursor, table: str) -> bool:
+        cursor.execute(
+            "SELECT 1 FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (table,)
+        )
+        return cursor.fetchone() is not None
+    
+    @staticmethod
+    def _partition_month(name: str) -> Optional[date]:
+        """解析 pYYYYMM 格式的分区名，其他分区返回None"""
+        if len(name) == 7 and name[0] == 'p' and name[1:].isdigit():
+            return date(int(name[1:5]), int(name[5:7]), 1)
+        return None
+    
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        """月份加减，返回当月1日"""
+        index = month.year * 12 + month.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+    
+    def get_latest_rates(self, base_currency: str) -> Optional[Dict[str, float]]:
+        """
+        查询最近一次保存的汇率数据
+        
+        Args:
+            base_currency: 基础货币
+        
+        Returns:
+            Optional[Dict[str, float]]: 最新快照的汇率数据，没有数据时返回None
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"""
+                SELECT currencies, {self._keyframe_column(cursor)}
+                FROM exchange_rates
+                WHERE base_currency = %s
+                ORDER BY data_updated_at DESC, id DESC
+                LIMIT 1
+                """, (base_currency,))
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                keyframes = self._load_keyframes(cursor, [row[1]]) if row[1] is not None else {}
+            finally:
+                cursor.close()
+        return self._decode_currencies(row[0], row[1], keyframes)
+    
+    def get_existing_dates(self, start_date: date, end_date: date, base_currency: Optional[str] = None) -> Set[date]:
+        """
+        查询一段日期内已有快照的日期
+        
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+        
+        Returns:
+            Set[date]: 至少有一份快照的日期
+        """
+        base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        conditions, params = self._date_range_conditions(start_date, end_date)
+        # 条件直接作用在 data_updated_at 上，走 idx_data_updated_at 范围扫描
+        sql = f"""
+        SELECT DISTINCT DATE(data_updated_at)
+        FROM exchange_rates
+        WHERE {' AND '.join(conditions)} AND base_currency = %s
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, (*params, base_currency))
+                return {row[0] for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+    
+    def iter_snapshots(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       base_currency: Optional[str] = None,
+                       updated_since: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间顺序流式读取汇率快照，读取过程中占用一个连接
+        
+        Args:
+            start_date: 开始日期(包含)，为None时不限制
+            end_date: 结束日期(包含)，为None时不限制
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+            updated_since: 只读取写入时间(updated_at)不早于该时间的快照，用于增量刷新
+        
+        Yields:
+            Dict[str, Any]: 包含 base_currency、currencies、data_provider、data_updated_at、updated_at 的快照
+        """
+        base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        conditions, params = self._date_range_conditions(start_date, end_date)
+        if updated_since:
+            conditions.append("updated_at >= %s")
+            params.append(updated_since)
+        where = f"base_currency = %s{''.join(' AND ' + condition for condition in conditions)}"
+        
+        with self.connection() as conn:
+            # 先一次性载入范围内差量引用的关键帧，之后单次顺序扫描即可还原全部快照
+            keyframes = {}
+            cursor = conn.cursor()
+            try:
+                sql = f"""
+                SELECT base_currency, currencies, data_provider, data_updated_at, updated_at,
+                    {self._keyframe_column(cursor)}
+                FROM exchange_rates
+                WHERE {where}
+                ORDER BY data_updated_at, id
+                """
+                if self._has_deltas(cursor):
+                    cursor.execute(f"SELECT DISTINCT keyframe_id FROM exchange_rates "
+                                   f"WHERE {where} AND keyframe_id IS NOT NULL", (base_currency, *params))
+                    keyframes = self._load_keyframes(cursor, [row[0] for row in cursor.fetchall()])
+            finally:
+                cursor.close()
+            
+            # 非缓冲游标边读边返回，避免一次性把全部JSON载入内存
+            cursor = conn.cursor(buffered=False)
+            try:
+                cursor.execute(sql, (base_currency, *params))
+                for row_base, currencies, provider, data_updated_at, updated_at, keyframe_id in cursor:
+                    yield {
+                        'base_currency': row_base,
+                        'currencies': self._decode_currencies(currencies, keyframe_id, keyframes),
+                        'data_provider': provider,
+                        'data_updated_at': data_updated_at,
+                        'updated_at': updated_at
+                    }
+            finally:
+                # 提前结束迭代时需要读完剩余结果，连接才能归还连接池
+                if conn.unread_result:
+                    conn.consume_results()
+                cursor.close()
+    
+    def get_rate(self, quote_currency: str, on_date: date, base_currency: Optional[str] = None) -> Optional[float]:
+        """
+        查询某天的汇率，当天没有数据时取之前最近一天的汇率
+        
+        Args:
+            quote_currency: 报价货币
+            on_date: 日期
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+        
+        Returns:
+            Optional[float]: 1单位基础货币可兑换的报价货币数量，没有数据时返回None
+        """
+        base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._PREVIOUS_RATE_SQL, (base_currency, quote_currency, on_date))
+                row = cursor.fetchone()
+            finally:
+                cursor.close()
+        return float(row[1]) if row else None
+    
+    def get_rates(self, quote_currencies: Iterable[str], start_date: date, end_date: date,
+                  base_currency: Optional[str] = None) -> Dict[str, Dict[date, float]]:
+        """
+        查询一段日期内多个币种的每日汇率，缺失的日期使用之前最近一天的汇率填充
+        
+        Args:
+            quote_currencies: 报价货币列表
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+        
+        Returns:
+            Dict[str, Dict[date, float]]: {报价货币: {日期: 汇率}}，
+            早于该币种最早数据的日期不包含在结果中
+        """
+        base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        quote_currencies = sorted(set(quote_currencies))
+        if not quote_currencies:
+            return {}
+        
+        placeholders = ', '.join(['%s'] * len(quote_currencies))
+        range_sql = f"""
+        SELECT quote_currency, rate_date, rate
+        FROM exchange_rate_points
+        WHERE base_currency = %s AND quote_currency IN ({placeholders})
+          AND rate_date BETWEEN %s AND %s
+        ORDER BY quote_currency, rate_date
+        """
+        
+        known: Dict[str, Dict[date, float]] = {quote: {} for quote in quote_currencies}
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # 每个币种取开始日期当天或之前最近的一条作为填充起点
+                for quote in quote_currencies:
+                    cursor.execute(self._PREVIOUS_RATE_SQL, (base_currency, quote, start_date))
+                    row = cursor.fetchone()
+                    if row:
+                        known[quote][start_date] = float(row[1])
+                
+                cursor.execute(range_sql, (base_currency, *quote_currencies, start_date, end_date))
+                for quote, rate_date, rate in cursor.fetchall():
+                    known[quote][rate_date] = float(rate)
+            finally:
+                cursor.close()
+        
+        results = {}
+        for quote, rates in known.items():
+            filled = {}
+            current = None
+            day = start_date
+            while day <= end_date:
+                current = rates.get(day, current)
+                if current is not None:
+                    filled[day] = current
+                day += timedelta(days=1)
+            results[quote] = filled
+        return results
+    
+    # 主键 (base_currency, quote_currency, rate_date) 上的倒序范围查找，只需一次索引定位
+    _PREVIOUS_RATE_SQL = """
+    SELECT rate_date, rate
+    FROM exchange_rate_points
+    WHERE base_currency = %s AND quote_currency = %s AND rate_date <= %s
+    ORDER BY rate_date DESC
+    LIMIT 1
+    """
+    
+    @staticmethod
+    def _point_rows(base_currency: str, currencies: Dict[str, float], provider: str,
+                    updated_at: datetime) -> List[Tuple[str, str, date, float, str]]:
+        """将一份快照拆分为 exchange_rate_points 的行"""
+        rate_date = updated_at.date()
+        return [
+            (base_currency, quote_currency, rate_date, float(rate), provider)
+            for quote_currency, rate in currencies.items()
+            if rate is not None
+        ]
+    
+    @staticmethod
+    def _write_points(cursor, point_rows: List[Tuple[str, str, date, float, str]], batch_size: int) -> None:
+        """批量写入汇率点，同一天重复写入时以最后一次为准"""
+        sql = """
+        INSERT INTO exchange_rate_points
+        (base_currency, quote_currency, rate_date, rate, data_provider)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE rate = VALUES(rate), data_provider = VALUES(data_provider)
+        """
+        for i in range(0, len(point_rows), batch_size):
+            cursor.executemany(sql, point_rows[i:i + batch_size])
+    
+    @staticmethod
+    def _date_range_conditions(start_date: Optional[date], end_date: Optional[date]) -> Tuple[List[str], List[Any]]:
+        """生成 data_updated_at 上的范围条件，保持列本身不被函数包裹以便走索引"""
+        conditions, params = [], []
+        if start_date:
+            conditions.append("data_updated_at >= %s")
+            params.append(datetime.combine(start_date, datetime.min.time()))
+        if end_date:
+            conditions.append("data_updated_at < %s")
+            params.append(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        return conditions, params
@@ -0,0 +1,14 @@
+-- currency_sync normalize --table 的结果表，建在订单库中
+CREATE TABLE order_amounts (
+    order_id BIGINT UNSIGNED NOT NULL COMMENT 'jingyu_prepaid.id',
+    pc_finish_time DATETIME NULL COMMENT '订单完成时间，换算使用该日的汇率',
+    local_amount VARCHAR(32) NULL COMMENT '原始本地金额，如 TRY229.990',
+    currency CHAR(3) NULL COMMENT '解析出的币种，无法解析时为NULL',
+    amount DECIMAL(20, 6) NULL COMMENT '解析出的金额',
+    target_currency CHAR(3) NOT NULL COMMENT '目标货币',
+    converted_amount DECIMAL(20, 6) NULL COMMENT '换算后的金额，金额无法解析或缺少汇率时为NULL',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最后更新时间',
+
+    PRIMARY KEY (order_id),
+    INDEX idx_pc_finish_time (pc_finish_time)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='订单金额归一化结果';
@@ -0,0 +1,158 @@
+"""
+同步指标模块。
+
+在进程内累计提供方请求和同步任务的指标，按 Prometheus 文本格式写入文件，
+供 node_exporter 的 textfile collector 采集。
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('metrics')
+
+DEFAULT_METRICS_PATH = Path(__file__).parent.parent / 'metrics' / 'currency_sync.prom'
+
+# 提供方请求耗时直方图的桶上界(秒)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(**labels: str) -> str:
+    """格式化标签"""
+    pairs = ','.join(
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"' for key, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+class SyncMetrics:
+    """同步指标，可在多个线程间共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bucket_counts: Dict[str, List[int]] = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self._latency_sum: Dict[str, float] = defaultdict(float)
+        self._latency_count: Dict[str, int] = defaultdict(int)
+        self._requests: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._provider_last_success: Dict[str, float] = {}
+        self._runs: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._run_duration: Dict[str, float] = {}
+        self._run_last_success: Dict[str, float] = {}
+
+    def observe_request(self, provider: str, latency: float, success: bool) -> None:
+        """
+        记录一次提供方请求，签名与 ProviderStats 的观察者一致
+
+        Args:
+            provider: 提供方名称
+            latency: 请求耗时(秒)
+            success: 是否成功
+        """
+        with self._lock:
+            buckets = self._bucket_counts[provider]
+            for i, upper in enumerate(LATENCY_BUCKETS):
+                if latency <= upper:
+                    buckets[i] += 1
+            self._latency_sum[provider] += latency
+            self._latency_count[provider] += 1
+            self._requests[(provider, 'success' if success else 'failure')] += 1
+            if success:
+                self._provider_last_success[provider] = time.time()
+
+    def observe_run(self, kind: str, duration: float, success: bool) -> None:
+        """
+        记录一次同步任务
+
+        Args:
+            kind: 任务类型，如 latest、gap_fill
+            duration: 任务耗时(秒)
+            success: 是否成功
+        """
+        with self._lock:
+            self._runs[(kind, 'success' if success else 'failure')] += 1
+            self._run_duration[kind] = duration
+            if success:
+                self._run_last_success[kind] = time.time()
+
+    def render(self) -> str:
+        """
+        生成 Prometheus 文本格式的指标
+
+        Returns:
+            str: 指标文本
+        """
+        with self._lock:
+            lines = [
+                '# HELP currency_sync_provider_request_duration_seconds 提供方请求耗时',
+                '# TYPE currency_sync_provider_request_duration_seconds histogram',
+            ]
+            for provider in sorted(self._latency_count):
+                for upper, count in zip(LATENCY_BUCKETS, self._bucket_counts[provider]):
+                    lines.append(f'currency_sync_provider_request_duration_seconds_bucket'
+                                 f'{_labels(provider=provider, le=upper)} {count}')
+                lines.append(f'currency_sync_provider_request_duration_seconds_bucket'
+                             f'{_labels(provider=provider, le="+Inf")} {self._latency_count[provider]}')
+                lines.append(f'currency_sync_provider_request_duration_seconds_sum'
+                             f'{_labels(provider=provider)} {self._latency_sum[provider]:.6f}')
+                lines.append(f'currency_sync_provider_request_duration_seconds_count'
+                             f'{_labels(provider=provider)} {self._latency_count[provider]}')
+
+            lines += [
+                '# HELP currency_sync_provider_requests_total 提供方请求次数',
+                '# TYPE currency_sync_provider_requests_total counter',
+            ]
+            for (provider, result), count in sorted(self._requests.items()):
+                lines.append(f'currency_sync_provider_requests_total{_labels(provider=provider, result=result)} {count}')
+
+            lines += [
+                '# HELP currency_sync_provider_last_success_timestamp_seconds 提供方最近一次请求成功的时间',
+                '# TYPE currency_sync_provider_last_success_timestamp_seconds gauge',
+            ]
+            for provider, timestamp in sorted(self._provider_last_success.items()):
+                lines.append(f'currency_sync_provider_last_success_timestamp_seconds'
+                             f'{_labels(provider=provider)} {timestamp:.3f}')
+
+            lines += [
+                '# HELP currency_sync_runs_total 同步任务执行次数',
+                '# TYPE currency_sync_runs_total counter',
+            ]
+            for (kind, result), count in sorted(self._runs.items()):
+                lines.append(f'currency_sync_runs_total{_labels(kind=kind, result=result)} {count}')
+
+            lines += [
+                '# HELP currency_sync_run_duration_seconds 最近一次同步任务耗时',
+                '# TYPE currency_sync_run_duration_seconds gauge',
+            ]
+            for kind, duration in sorted(self._run_duration.items()):
+                lines.append(f'currency_sync_run_duration_seconds{_labels(kind=kind)} {duration:.6f}')
+
+            lines += [
+                '# HELP currency_sync_last_success_timestamp_seconds 最近一次同步任务成功的时间，用于汇率新鲜度告警',
+                '# TYPE currency_sync_last_success_timestamp_seconds gauge',
+            ]
+            for kind, timestamp in sorted(self._run_last_success.items()):
+                lines.append(f'currency_sync_last_success_timestamp_seconds{_labels(kind=kind)} {timestamp:.3f}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Optional[str] = None) -> None:
+        """
+        写入指标文件，先写临时文件再原子替换，避免采集到写了一半的文件
+
+        Args:
+            path: 文件路径，默认读取环境变量 METRICS_PATH
+        """
+        path = Path(path or os.getenv('METRICS_PATH') or DEFAULT_METRICS_PATH)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"写入指标文件 {path} 失败: {str(e)}")
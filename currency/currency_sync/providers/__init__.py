@@ -6,25 +6,42 @@ from typing import List, Optional
 from currency_sync.providers.base import ExchangeRateProvider
 from currency_sync.providers.currencyapi import CurrencyApiProvider
 from currency_sync.providers.exchangerate_api import ExchangeRateApiProvider
+from currency_sync.providers.stats import ProviderStats
 
 from currency_sync.utils.logger import setup_logger
 
 logger = setup_logger('providers')
 
 # 按优先级顺序注册提供方
-def get_providers() -> List[ExchangeRateProvider]:
-    """获取所有注册的汇率提供方，按优先级排序"""
-    return [
+def get_providers(stats: Optional[ProviderStats] = None) -> List[ExchangeRateProvider]:
+    """
+    获取所有注册的汇率提供方
+    
+    Args:
+        stats: 提供方统计，指定时记录每个提供方的请求结果
+        
+    Returns:
+        List[ExchangeRateProvider]: 按注册优先级排序的全部提供方；按统计排序和跳过熔断中的提供方
+            由调用方在每次同步时通过 ProviderStats.order 进行，熔断结束后的提供方会重新参与
+    """
+    providers = [
         CurrencyApiProvider(),
         ExchangeRateApiProvider(),
     ]
+    if stats is None:
+        return providers
+    
+    for provider in providers:
+        provider.stats = stats
+    return providers
 
-def get_provider_by_name(name: str) -> Optional[ExchangeRateProvider]:
+def get_provider_by_name(name: str, stats: Optional[ProviderStats] = None) -> Optional[ExchangeRateProvider]:
     """
     根据名称获取特定的汇率提供方
     
     Args:
         name: 提供方名称，不区分大小写
+        stats: 提供方统计，指定时记录该提供方的请求结果
         
     Returns:
         Optional[ExchangeRateProvider]: 找到的提供方实例，如果未找到则返回None
@@ -42,7 +59,9 @@ def get_provider_by_name(name: str) -> Optional[ExchangeRateProvider]:
     
     provider_class = provider_map.get(name)
     if provider_class:
-        return provider_class()
+        provider = provider_class()
+        provider.stats = stats
+        return provider
     
     logger.warning(f"未找到名为 {name} 的提供方")
     logger.info(f"可用的提供方: {', '.join(provider_map.keys())}")
@@ -53,6 +72,7 @@ __all__ = [
     'ExchangeRateProvider',
     'CurrencyApiProvider',
     'ExchangeRateApiProvider',
+    'ProviderStats',
     'get_providers',
     'get_provider_by_name'
 ]
\ No newline at end of file
@@ -0,0 +1,95 @@
+"""
+异步 HTTP 客户端模块。
+
+基于 aiohttp 的共享连接池，按主机限制并发连接数。aiohttp 为可选依赖，
+通过 `pip install 'currency_sync[async]'` 安装，未安装时只有调用异步接口才会报错。
+"""
+
+import os
+import json
+import asyncio
+from typing import Any, Dict, Optional
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - 可选依赖
+    aiohttp = None
+
+# 与同步会话的 urllib3 Retry 配置保持一致
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+def create_async_session(limit: Optional[int] = None, limit_per_host: Optional[int] = None):
+    """
+    创建共享的 aiohttp 会话，需在事件循环中调用，使用完毕后关闭(可用 async with)
+
+    Args:
+        limit: 总连接数上限，默认读取环境变量 ASYNC_HTTP_LIMIT
+        limit_per_host: 每个主机的连接数上限，默认读取环境变量 ASYNC_HTTP_LIMIT_PER_HOST
+
+    Returns:
+        aiohttp.ClientSession: 会话
+    """
+    if aiohttp is None:
+        raise ImportError("异步请求需要安装 aiohttp: pip install 'currency_sync[async]'")
+    connector = aiohttp.TCPConnector(
+        limit=limit or int(os.getenv('ASYNC_HTTP_LIMIT', '100')),
+        limit_per_host=limit_per_host or int(os.getenv('ASYNC_HTTP_LIMIT_PER_HOST', '16'))
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+async def request_with_retry(session, url: str, params: Optional[Dict[str, Any]], headers: Dict[str, str],
+                             timeout: float) -> 'AsyncResponse':
+    """
+    发起 GET 请求，对连接错误、超时和 429/5xx 响应按指数退避重试
+
+    Args:
+        session: aiohttp 会话
+        url: 请求地址
+        params: 查询参数，值为None的参数不发送(与 requests 一致)
+        headers: 请求头
+        timeout: 单次请求超时时间(秒)
+
+    Returns:
+        AsyncResponse: 最后一次请求的响应
+    """
+    params = {key: value for key, value in (params or {}).items() if value is not None}
+    for attempt in range(RETRY_TOTAL + 1):
+        delay = RETRY_BACKOFF * (2 ** attempt)
+        try:
+            async with session.get(url, params=params, headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+                response = AsyncResponse(str(resp.url), resp.status, resp.headers, await resp.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == RETRY_TOTAL:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                return response
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+        await asyncio.sleep(delay)
+
+
+class AsyncResponse:
+    """已读取完毕的响应，接口与解析代码用到的 requests.Response 子集一致"""
+
+    def __init__(self, url: str, status_code: int, headers: Any, body: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = body
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        """4xx/5xx 时抛出 requests.HTTPError，与同步请求的异常类型一致"""
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
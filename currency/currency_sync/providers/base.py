@@ -3,21 +3,72 @@
 """
 
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, date
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 import os
+import time
+import asyncio
+import threading
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from currency_sync.providers.async_http import AsyncResponse, create_async_session, request_with_retry
 from currency_sync.utils.logger import setup_logger
+from currency_sync.utils.dates import date_range
+from currency_sync.utils.rate_limiter import RateLimiter
 
 logger = setup_logger('provider')
 
+# 线程内的请求状态，对冲模式下落败请求的取消事件见 set_cancel_event
+_thread_state = threading.local()
+
+def set_cancel_event(event: threading.Event) -> None:
+    """
+    为当前线程的请求设置取消事件
+
+    事件触发后，该线程不再发起新请求，也不再退避重试，失败的请求不计入提供方统计。
+    已经发出的请求无法中断，仍会占用连接直到收到响应或超时。
+    """
+    _thread_state.cancel_event = event
+
+def _request_cancelled() -> bool:
+    """当前线程的请求是否已被取消"""
+    event = getattr(_thread_state, 'cancel_event', None)
+    return event is not None and event.is_set()
+
+class _CancellableRetry(Retry):
+    """当前线程的请求被取消后视为重试次数已用完，不再等待退避和重试"""
+
+    def is_exhausted(self) -> bool:
+        return _request_cancelled() or super().is_exhausted()
+
 class ExchangeRateProvider(ABC):
     """汇率数据提供方抽象基类"""
+
+    # 限速配置的环境变量名(每秒请求数)，子类覆盖
+    rate_limit_env: Optional[str] = None
+    # 未配置环境变量时的默认限速(每秒请求数)，0表示不限速
+    default_rate_limit: float = 5.0
     
     def __init__(self):
         """初始化提供方"""
         self.name = self.__class__.__name__
         self.base_currency = os.getenv('BASE_CURRENCY', 'USD')
+        rate_limit = os.getenv(self.rate_limit_env) if self.rate_limit_env else None
+        self.rate_limiter = RateLimiter(float(rate_limit) if rate_limit else self.default_rate_limit)
+        self.session = self._build_session()
+        # 条件请求的校验信息 {url: {'etag': ..., 'last_modified': ...}}，只包含已确认写入的响应
+        self._validators: Dict[str, Dict[str, str]] = {}
+        # 上一次已确认写入的最新汇率，用于判断数据是否变化
+        self._last_latest: Optional[Dict[str, Any]] = None
+        # 已获取但尚未确认写入的最新汇率和校验信息，由 mark_saved 提交
+        self._pending_latest: Optional[Dict[str, Any]] = None
+        self._pending_validators: Dict[str, Dict[str, str]] = {}
+        # 请求统计(ProviderStats)，由注册模块设置
+        self.stats = None
         logger.info(f"初始化提供方: {self.name}")
     
     @abstractmethod
@@ -35,10 +86,214 @@ class ExchangeRateProvider(ABC):
                 'data_updated_at': datetime对象,
                 'data_provider': '提供方名称'
             }
+            最新汇率与上一次确认写入(见 mark_saved)的相同时，返回上一次的数据并附加 'unchanged': True；
             如果获取失败则返回None
         """
         pass
     
+    def fetch_rates_range(self, start_date: date, end_date: date, concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        批量获取一段日期范围的历史汇率数据
+
+        默认实现为并发逐日调用 fetch_rates，有区间/时间序列接口的提供方应覆盖此方法。
+
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 逐日请求时的并发数
+
+        Returns:
+            List[Dict[str, Any]]: 按日期排序的每日汇率数据，格式同 fetch_rates 的返回值，
+            获取失败的日期不包含在结果中
+        """
+        dates = date_range(start_date, end_date)
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix=f"{self.name}-range") as executor:
+            results = list(executor.map(self.fetch_rates, dates))
+        return [rate_data for rate_data in results if rate_data]
+    
+    async def fetch_rates_async(self, target_date: Optional[date] = None,
+                                session=None) -> Optional[Dict[str, Any]]:
+        """
+        异步获取汇率数据，返回值与 fetch_rates 相同
+        
+        Args:
+            target_date: 目标日期，如果为None则获取最新汇率
+            session: create_async_session 创建的共享会话，为None时临时创建
+        """
+        if session is None:
+            async with create_async_session() as session:
+                return await self.fetch_rates_async(target_date, session)
+        
+        try:
+            if target_date:
+                return await self._fetch_historical_rates_async(session, target_date)
+            return await self._fetch_latest_rates_async(session)
+        except Exception as e:
+            logger.error(f"{self.name} 异步获取汇率失败: {str(e)}")
+            return None
+    
+    async def fetch_rates_range_async(self, start_date: date, end_date: date, concurrency: int = 4,
+                                      session=None) -> List[Dict[str, Any]]:
+        """
+        异步批量获取历史汇率数据，返回值与 fetch_rates_range 相同
+        
+        默认实现为在同一事件循环中并发逐日调用 fetch_rates_async，并发数只受信号量、
+        会话的每主机连接数和限速器约束，不占用线程。
+        
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 同时进行的请求数
+            session: 共享会话，为None时临时创建
+        """
+        if session is None:
+            async with create_async_session() as session:
+                return await self.fetch_rates_range_async(start_date, end_date, concurrency, session)
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def fetch(target_date: date) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self.fetch_rates_async(target_date, session)
+        
+        results = await asyncio.gather(*(fetch(target_date) for target_date in date_range(start_date, end_date)))
+        return [rate_data for rate_data in results if rate_data]
+    
+    @abstractmethod
+    async def _fetch_latest_rates_async(self, session) -> Optional[Dict[str, Any]]:
+        """异步获取最新汇率数据，返回值与 fetch_rates 相同"""
+        pass
+    
+    @abstractmethod
+    async def _fetch_historical_rates_async(self, session, target_date: date) -> Optional[Dict[str, Any]]:
+        """异步获取历史汇率数据，返回值与 fetch_rates 相同"""
+        pass
+    
+    def _build_session(self) -> requests.Session:
+        """创建复用连接的 HTTP 会话，对连接错误和 429/5xx 响应按指数退避重试"""
+        retry = _CancellableRetry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def _get(self, url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10,
+             conditional: bool = False, record: bool = True) -> requests.Response:
+        """
+        限速后通过会话发起 GET 请求
+        
+        Args:
+            url: 请求地址
+            params: 查询参数
+            timeout: 超时时间(秒)
+            conditional: 是否携带 If-None-Match/If-Modified-Since 发起条件请求，
+                数据未变化时返回状态码为304的响应
+            record: 是否将本次请求的耗时和结果计入提供方统计
+        
+        Returns:
+            requests.Response: 状态码为2xx或304的响应
+        """
+        headers = self._conditional_headers(url) if conditional else {}
+        
+        self.throttle()
+        if _request_cancelled():
+            raise RuntimeError(f"{self.name} 的请求已取消")
+        started = time.monotonic()
+        try:
+            response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except Exception:
+            if record and self.stats and not _request_cancelled():
+                self.stats.record(self.name, time.monotonic() - started, False)
+            raise
+        if record and self.stats:
+            self.stats.record(self.name, time.monotonic() - started, True)
+        
+        if response.status_code == 304:
+            return response
+        
+        if conditional:
+            self._store_validators(url, response)
+        return response
+    
+    async def _get_async(self, session, url: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10,
+                         conditional: bool = False, record: bool = True) -> AsyncResponse:
+        """
+        限速后通过 aiohttp 会话发起 GET 请求，参数与 _get 相同
+        
+        Args:
+            session: create_async_session 创建的会话
+        
+        Returns:
+            AsyncResponse: 状态码为2xx或304的响应
+        """
+        headers = self._conditional_headers(url) if conditional else {}
+        
+        await self.rate_limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            response = await request_with_retry(session, url, params, headers, timeout)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except Exception:
+            if record and self.stats:
+                self.stats.record(self.name, time.monotonic() - started, False)
+            raise
+        if record and self.stats:
+            self.stats.record(self.name, time.monotonic() - started, True)
+        
+        if response.status_code != 304 and conditional:
+            self._store_validators(url, response)
+        return response
+    
+    def _conditional_headers(self, url: str) -> Dict[str, str]:
+        """根据上一次响应的 ETag/Last-Modified 生成条件请求头"""
+        headers = {}
+        validators = self._validators.get(url, {})
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+    
+    def _store_validators(self, url: str, response: Any) -> None:
+        """暂存响应的 ETag/Last-Modified，mark_saved 提交后才用于下一次条件请求"""
+        self._pending_validators[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified')
+        }
+    
+    def mark_saved(self) -> None:
+        """
+        调用方确认最新汇率已写入后调用，提交本次获取到的最新汇率和条件请求校验信息
+
+        写入失败时不调用，下一次同步仍按上一次已写入的数据判断是否变化，获取到的数据不会被误判为未变化而丢失。
+        """
+        if self._pending_latest is not None:
+            self._last_latest = self._pending_latest
+            self._pending_latest = None
+        self._validators.update(self._pending_validators)
+        self._pending_validators = {}
+    
+    def _unchanged_latest(self) -> Optional[Dict[str, Any]]:
+        """返回上一次已写入的最新汇率，并标记为未变化"""
+        if self._last_latest is None:
+            return None
+        logger.info(f"{self.name} 最新汇率未变化")
+        return {**self._last_latest, 'unchanged': True}
+    
+    def throttle(self) -> None:
+        """发起API请求前调用，按提供方限速等待"""
+        self.rate_limiter.acquire()
+    
     def get_timestamp(self) -> datetime:
         """获取当前时间戳"""
         return datetime.now()
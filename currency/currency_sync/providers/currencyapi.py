@@ -3,10 +3,11 @@ Currencyapi 汇率提供方模块。
 """
 
 import os
-import requests
-from datetime import datetime, date
-from typing import Dict, Optional, Any
+import asyncio
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Any, Tuple
 
+from currency_sync.providers.async_http import create_async_session
 from currency_sync.providers.base import ExchangeRateProvider
 from currency_sync.utils.logger import setup_logger
 
@@ -14,11 +15,16 @@ logger = setup_logger('currencyapi_provider')
 
 class CurrencyApiProvider(ExchangeRateProvider):
     """Currencyapi 汇率提供方"""
+
+    rate_limit_env = 'CURRENCYAPI_RATE_LIMIT'
+    # range 接口按天精度单次最多返回的天数
+    max_range_days = 366
     
     def __init__(self):
         super().__init__()
         self.api_url = "https://api.currencyapi.com/v3/latest"
         self.historical_api_url = "https://api.currencyapi.com/v3/historical"
+        self.range_api_url = "https://api.currencyapi.com/v3/range"
         self.api_key = os.getenv('CURRENCYAPI_KEY')
     
     def fetch_rates(self, target_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
@@ -37,26 +43,148 @@ class CurrencyApiProvider(ExchangeRateProvider):
             logger.error(f"Currencyapi 获取汇率失败: {str(e)}")
             return None
     
+    def fetch_rates_range(self, start_date: date, end_date: date, concurrency: int = 4) -> List[Dict[str, Any]]:
+        """
+        使用 range 接口批量获取历史汇率数据，每次请求最多覆盖 max_range_days 天
+
+        某个区间请求失败时(例如套餐不支持 range 接口)，该区间回退为逐日请求。
+
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 回退逐日请求时的并发数
+        """
+        results = []
+        for chunk_start, chunk_end in self._range_chunks(start_date, end_date):
+            try:
+                results.extend(self._fetch_range_rates(chunk_start, chunk_end))
+            except Exception as e:
+                logger.warning(f"Currencyapi range 接口获取 {chunk_start.isoformat()} 至 {chunk_end.isoformat()} "
+                               f"失败: {str(e)}，回退为逐日请求")
+                results.extend(super().fetch_rates_range(chunk_start, chunk_end, concurrency))
+        return results
+    
+    async def fetch_rates_range_async(self, start_date: date, end_date: date, concurrency: int = 4,
+                                      session=None) -> List[Dict[str, Any]]:
+        """
+        异步使用 range 接口批量获取历史汇率数据，各区间并发请求，失败的区间回退为逐日请求
+
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+            concurrency: 回退逐日请求时的并发数
+            session: 共享会话，为None时临时创建
+        """
+        if session is None:
+            async with create_async_session() as session:
+                return await self.fetch_rates_range_async(start_date, end_date, concurrency, session)
+
+        async def fetch_chunk(chunk_start: date, chunk_end: date) -> List[Dict[str, Any]]:
+            try:
+                url, params = self._range_request(chunk_start, chunk_end)
+                response = await self._get_async(session, url, params=params, timeout=30, record=False)
+                return self._parse_range(response.json(), chunk_start, chunk_end)
+            except Exception as e:
+                logger.warning(f"Currencyapi range 接口获取 {chunk_start.isoformat()} 至 {chunk_end.isoformat()} "
+                               f"失败: {str(e)}，回退为逐日请求")
+                return await super(CurrencyApiProvider, self).fetch_rates_range_async(
+                    chunk_start, chunk_end, concurrency, session)
+
+        chunks = await asyncio.gather(*(fetch_chunk(chunk_start, chunk_end)
+                                        for chunk_start, chunk_end in self._range_chunks(start_date, end_date)))
+        return [rate_data for chunk in chunks for rate_data in chunk]
+    
+    def _range_chunks(self, start_date: date, end_date: date) -> List[Tuple[date, date]]:
+        """按 max_range_days 切分日期区间"""
+        chunks = []
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + timedelta(days=self.max_range_days - 1), end_date)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+        return chunks
+    
     def _fetch_latest_rates(self) -> Optional[Dict[str, Any]]:
         """获取最新汇率数据"""
-        logger.info(f"从 Currencyapi 获取最新汇率数据，基础货币: {self.base_currency}")
+        url, params = self._latest_request()
+        return self._parse_latest(self._get(url, params=params, conditional=True))
+    
+    async def _fetch_latest_rates_async(self, session) -> Optional[Dict[str, Any]]:
+        """异步获取最新汇率数据"""
+        url, params = self._latest_request()
+        return self._parse_latest(await self._get_async(session, url, params=params, conditional=True))
+    
+    def _fetch_historical_rates(self, target_date: date) -> Optional[Dict[str, Any]]:
+        """
+        获取历史汇率数据
+        
+        Args:
+            target_date: 目标日期
+        """
+        url, params = self._historical_request(target_date)
+        return self._parse_historical(self._get(url, params=params).json(), target_date)
+    
+    async def _fetch_historical_rates_async(self, session, target_date: date) -> Optional[Dict[str, Any]]:
+        """异步获取历史汇率数据"""
+        url, params = self._historical_request(target_date)
+        response = await self._get_async(session, url, params=params)
+        return self._parse_historical(response.json(), target_date)
+    
+    def _fetch_range_rates(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """
+        调用 range 接口获取一段日期的历史汇率数据
         
-        params = {
+        Args:
+            start_date: 开始日期(包含)
+            end_date: 结束日期(包含)
+        """
+        url, params = self._range_request(start_date, end_date)
+        # 区间请求耗时与单日请求不可比，且套餐不支持时会固定失败，不计入统计
+        response = self._get(url, params=params, timeout=30, record=False)
+        return self._parse_range(response.json(), start_date, end_date)
+    
+    # 以下请求构造和响应解析由同步和异步请求共用
+    
+    def _latest_request(self) -> Tuple[str, Dict[str, Any]]:
+        logger.info(f"从 Currencyapi 获取最新汇率数据，基础货币: {self.base_currency}")
+        return self.api_url, {
             'base_currency': self.base_currency,
             'apikey': self.api_key
         }
-        
-        response = requests.get(self.api_url, params=params, timeout=10)
-        response.raise_for_status()
+    
+    def _historical_request(self, target_date: date) -> Tuple[str, Dict[str, Any]]:
+        logger.info(f"从 Currencyapi 获取 {target_date.isoformat()} 的历史汇率数据，基础货币: {self.base_currency}")
+        return self.historical_api_url, {
+            'base_currency': self.base_currency,
+            'apikey': self.api_key,
+            'date': target_date.isoformat()
+        }
+    
+    def _range_request(self, start_date: date, end_date: date) -> Tuple[str, Dict[str, Any]]:
+        logger.info(f"从 Currencyapi 获取 {start_date.isoformat()} 至 {end_date.isoformat()} 的历史汇率数据，"
+                    f"基础货币: {self.base_currency}")
+        return self.range_api_url, {
+            'base_currency': self.base_currency,
+            'apikey': self.api_key,
+            'datetime_start': f"{start_date.isoformat()}T00:00:00Z",
+            'datetime_end': f"{end_date.isoformat()}T23:59:59Z",
+            'accuracy': 'day'
+        }
+    
+    @staticmethod
+    def _parse_currencies(data: Dict[str, Any]) -> Dict[str, float]:
+        """解析 Currencyapi 特有的 {代码: {'code': ..., 'value': ...}} 格式"""
+        return {currency_code: currency_data.get('value', 0.0) for currency_code, currency_data in data.items()}
+    
+    def _parse_latest(self, response: Any) -> Optional[Dict[str, Any]]:
+        """解析最新汇率响应，数据未变化时返回上一次的数据"""
+        if response.status_code == 304:
+            return self._unchanged_latest()
         
         data = response.json()
         logger.debug(f"Currencyapi 响应数据: {data}")
         
-        # 解析 Currencyapi 特有的数据格式
-        currencies = {}
-        if 'data' in data:
-            for currency_code, currency_data in data['data'].items():
-                currencies[currency_code] = currency_data.get('value', 0.0)
+        currencies = self._parse_currencies(data.get('data', {}))
         
         # 获取时间戳
         last_updated = data.get('meta', {}).get('last_updated_at')
@@ -68,43 +196,38 @@ class CurrencyApiProvider(ExchangeRateProvider):
                 updated_at = self.get_timestamp()
         else:
             updated_at = self.get_timestamp()
+        
+        # 数据更新时间未变化说明汇率未更新
+        if last_updated and self._last_latest and self._last_latest['data_updated_at'] == updated_at:
+            return self._unchanged_latest()
             
-        return {
+        self._pending_latest = {
             'currencies': currencies,
             'data_updated_at': updated_at,
             'data_provider': 'Currencyapi'
         }
+        return self._pending_latest
     
-    def _fetch_historical_rates(self, target_date: date) -> Optional[Dict[str, Any]]:
-        """
-        获取历史汇率数据
-        
-        Args:
-            target_date: 目标日期
-        """
-        logger.info(f"从 Currencyapi 获取 {target_date.isoformat()} 的历史汇率数据，基础货币: {self.base_currency}")
-        
-        params = {
-            'base_currency': self.base_currency,
-            'apikey': self.api_key,
-            'date': target_date.isoformat()
-        }
-        response = requests.get(self.historical_api_url, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
-        # 解析 Currencyapi 特有的数据格式
-        currencies = {}
-        if 'data' in data:
-            for currency_code, currency_data in data['data'].items():
-                currencies[currency_code] = currency_data.get('value', 0.0)
-        
-        # 创建日期时间对象
-        updated_at = datetime.combine(target_date, datetime.min.time())
-            
+    def _parse_historical(self, data: Dict[str, Any], target_date: date) -> Dict[str, Any]:
+        """解析历史汇率响应"""
         return {
-            'currencies': currencies,
-            'data_updated_at': updated_at,
+            'currencies': self._parse_currencies(data.get('data', {})),
+            'data_updated_at': datetime.combine(target_date, datetime.min.time()),
             'data_provider': 'Currencyapi'
-        }
\ No newline at end of file
+        }
+    
+    def _parse_range(self, data: Dict[str, Any], start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """解析 range 接口响应，只保留请求区间内的日期"""
+        results = []
+        for item in data.get('data', []):
+            target_date = datetime.fromisoformat(item['datetime'].replace('Z', '+00:00')).date()
+            if target_date < start_date or target_date > end_date:
+                continue
+            
+            results.append({
+                'currencies': self._parse_currencies(item.get('currencies', {})),
+                'data_updated_at': datetime.combine(target_date, datetime.min.time()),
+                'data_provider': 'Currencyapi'
+            })
+        
+        return sorted(results, key=lambda rate_data: rate_data['data_updated_at'])
@@ -3,7 +3,7 @@ ExchangeRate-API 汇率提供方模块。
 """
 
 import os
-import requests
+import time
 from datetime import datetime, date
 from typing import Dict, Optional, Any
 
@@ -14,6 +14,8 @@ logger = setup_logger('exchangerate_api_provider')
 
 class ExchangeRateApiProvider(ExchangeRateProvider):
     """ExchangeRate-API 汇率提供方"""
+
+    rate_limit_env = 'EXCHANGERATE_API_RATE_LIMIT'
     
     def __init__(self):
         super().__init__()
@@ -22,6 +24,9 @@ class ExchangeRateApiProvider(ExchangeRateProvider):
         # 历史汇率API
         self.history_api_url = "https://v6.exchangerate-api.com/v6/{api_key}/history/{base_currency}/{year}/{month}/{day}"
         self.api_key = os.getenv('EXCHANGERATE_API_KEY')
+        # 接口返回的下一次数据更新时间，在此之前无需再次请求最新汇率；与最新汇率一样在确认写入后才提交
+        self._next_update_unix: Optional[int] = None
+        self._pending_next_update: Optional[int] = None
     
     def fetch_rates(self, target_date: Optional[date] = None) -> Optional[Dict[str, Any]]:
         """
@@ -41,16 +46,63 @@ class ExchangeRateApiProvider(ExchangeRateProvider):
     
     def _fetch_latest_rates(self) -> Optional[Dict[str, Any]]:
         """获取最新汇率数据"""
-        logger.info(f"从 ExchangeRate-API 获取最新汇率数据，基础货币: {self.base_currency}")
+        if self._latest_not_due():
+            return self._unchanged_latest()
+        return self._parse_latest(self._get(self._latest_url(), conditional=True))
+    
+    async def _fetch_latest_rates_async(self, session) -> Optional[Dict[str, Any]]:
+        """异步获取最新汇率数据"""
+        if self._latest_not_due():
+            return self._unchanged_latest()
+        return self._parse_latest(await self._get_async(session, self._latest_url(), conditional=True))
+    
+    def _fetch_historical_rates(self, target_date: date) -> Optional[Dict[str, Any]]:
+        """
+        获取历史汇率数据
         
-        # 构建 URL
-        url = self.latest_api_url.format(
+        Args:
+            target_date: 目标日期
+        """
+        return self._parse_historical(self._get(self._history_url(target_date)).json(), target_date)
+    
+    async def _fetch_historical_rates_async(self, session, target_date: date) -> Optional[Dict[str, Any]]:
+        """异步获取历史汇率数据"""
+        response = await self._get_async(session, self._history_url(target_date))
+        return self._parse_historical(response.json(), target_date)
+    
+    # 以下请求构造和响应解析由同步和异步请求共用
+    
+    def _latest_not_due(self) -> bool:
+        """接口返回的下一次数据更新时间之前无需再次请求最新汇率"""
+        return bool(self._last_latest and self._next_update_unix and time.time() < self._next_update_unix)
+    
+    def mark_saved(self) -> None:
+        """确认写入后同时提交下一次数据更新时间"""
+        if self._pending_latest is not None:
+            self._next_update_unix = self._pending_next_update
+        super().mark_saved()
+    
+    def _latest_url(self) -> str:
+        logger.info(f"从 ExchangeRate-API 获取最新汇率数据，基础货币: {self.base_currency}")
+        return self.latest_api_url.format(
             api_key=self.api_key,
             base_currency=self.base_currency
         )
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
+    
+    def _history_url(self, target_date: date) -> str:
+        logger.info(f"从 ExchangeRate-API 获取 {target_date.isoformat()} 的历史汇率数据，基础货币: {self.base_currency}")
+        return self.history_api_url.format(
+            api_key=self.api_key,
+            base_currency=self.base_currency,
+            year=target_date.year,
+            month=target_date.month,
+            day=target_date.day
+        )
+    
+    def _parse_latest(self, response: Any) -> Optional[Dict[str, Any]]:
+        """解析最新汇率响应，数据未变化时返回上一次的数据"""
+        if response.status_code == 304:
+            return self._unchanged_latest()
         
         data = response.json()
         logger.debug(f"ExchangeRate-API 响应数据: {data}")
@@ -70,51 +122,31 @@ class ExchangeRateApiProvider(ExchangeRateProvider):
             updated_at = datetime.fromtimestamp(time_last_update)
         else:
             updated_at = self.get_timestamp()
+        
+        next_update = data.get('time_next_update_unix')
+        if time_last_update and self._last_latest and self._last_latest['data_updated_at'] == updated_at:
+            self._next_update_unix = next_update
+            return self._unchanged_latest()
             
-        return {
+        self._pending_next_update = next_update
+        self._pending_latest = {
             'currencies': currencies,
             'data_updated_at': updated_at,
             'data_provider': 'ExchangeRate-API'
         }
+        return self._pending_latest
     
-    def _fetch_historical_rates(self, target_date: date) -> Optional[Dict[str, Any]]:
-        """
-        获取历史汇率数据
-        
-        Args:
-            target_date: 目标日期
-        """
-        logger.info(f"从 ExchangeRate-API 获取 {target_date.isoformat()} 的历史汇率数据，基础货币: {self.base_currency}")
-        
-        # 构建 URL
-        url = self.history_api_url.format(
-            api_key=self.api_key,
-            base_currency=self.base_currency,
-            year=target_date.year,
-            month=target_date.month,
-            day=target_date.day
-        )
-        
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        
+    def _parse_historical(self, data: Dict[str, Any], target_date: date) -> Optional[Dict[str, Any]]:
+        """解析历史汇率响应"""
         # 检查响应状态
         if data.get('result') != 'success':
             error_type = data.get('error-type', '未知错误')
             logger.error(f"ExchangeRate-API 返回错误: {error_type}")
             return None
         
-        # 获取汇率数据
         # 注意：历史API可能返回不同的数据结构
-        conversion_rates = data.get('conversion_rates', {})
-        
-        # 创建日期时间对象
-        updated_at = datetime.combine(target_date, datetime.min.time())
-            
         return {
-            'currencies': conversion_rates,
-            'data_updated_at': updated_at,
+            'currencies': data.get('conversion_rates', {}),
+            'data_updated_at': datetime.combine(target_date, datetime.min.time()),
             'data_provider': 'ExchangeRate-API'
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,231 @@
+"""
+提供方延迟与失败统计模块。
+
+记录每个提供方最近若干次请求的耗时和结果并持久化到本地状态文件，
+按预期耗时对提供方排序，连续失败达到阈值时熔断一段时间。
+"""
+
+import os
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('provider_stats')
+
+DEFAULT_STATS_PATH = Path(__file__).parent.parent.parent / 'state' / 'provider_stats.json'
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """
+    计算分位数(最近秩法)
+
+    Args:
+        values: 样本
+        q: 分位点，取值 0~100
+
+    Returns:
+        Optional[float]: 分位数，样本为空时返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class ProviderStats:
+    """提供方请求统计与熔断器，可在多个线程间共享"""
+
+    def __init__(self, path: Optional[str] = None, failure_threshold: Optional[int] = None,
+                 cooldown: Optional[float] = None, window: int = 100, timeout_penalty: float = 10.0):
+        """
+        初始化统计
+
+        Args:
+            path: 状态文件路径，默认读取环境变量 PROVIDER_STATS_PATH
+            failure_threshold: 连续失败多少次后熔断，默认读取环境变量 PROVIDER_FAILURE_THRESHOLD
+            cooldown: 熔断持续时间(秒)，默认读取环境变量 PROVIDER_COOLDOWN
+            window: 每个提供方保留的最近请求数
+            timeout_penalty: 计算预期耗时时每次失败计入的耗时(秒)，与请求超时一致
+        """
+        self.path = Path(path or os.getenv('PROVIDER_STATS_PATH') or DEFAULT_STATS_PATH)
+        self.failure_threshold = failure_threshold or int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '3'))
+        self.cooldown = cooldown or float(os.getenv('PROVIDER_COOLDOWN', '1800'))
+        self.window = window
+        self.timeout_penalty = timeout_penalty
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = self._load()
+        self._observers: List[Callable[[str, float, bool], None]] = []
+
+    def add_observer(self, observer: Callable[[str, float, bool], None]) -> None:
+        """
+        注册请求结果的观察者，每次 record 时以 (提供方名称, 耗时, 是否成功) 调用
+
+        Args:
+            observer: 回调函数
+        """
+        self._observers.append(observer)
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """读取状态文件，文件不存在或损坏时从空状态开始"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"读取提供方统计文件 {self.path} 失败: {str(e)}")
+            return {}
+
+    def save(self) -> None:
+        """写入状态文件，先写临时文件再原子替换"""
+        with self._lock:
+            payload = json.dumps(self._state, ensure_ascii=False, indent=2)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"保存提供方统计文件 {self.path} 失败: {str(e)}")
+
+    def record(self, name: str, latency: float, success: bool) -> None:
+        """
+        记录一次请求结果
+
+        Args:
+            name: 提供方名称
+            latency: 请求耗时(秒)
+            success: 是否成功
+        """
+        for observer in self._observers:
+            observer(name, latency, success)
+
+        now = time.time()
+        with self._lock:
+            state = self._state.setdefault(name, {
+                'samples': [],
+                'successes': 0,
+                'failures': 0,
+                'consecutive_failures': 0,
+                'open_until': 0,
+                'last_success_at': None,
+                'last_failure_at': None
+            })
+            state['samples'] = (state['samples'] + [[round(latency, 4), success]])[-self.window:]
+
+            if success:
+                state['successes'] += 1
+                state['consecutive_failures'] = 0
+                state['open_until'] = 0
+                state['last_success_at'] = now
+                return
+
+            state['failures'] += 1
+            state['consecutive_failures'] += 1
+            state['last_failure_at'] = now
+            if state['consecutive_failures'] >= self.failure_threshold:
+                state['open_until'] = now + self.cooldown
+                logger.warning(f"{name} 连续失败 {state['consecutive_failures']} 次，熔断 {self.cooldown:.0f} 秒")
+
+    def is_open(self, name: str) -> bool:
+        """
+        判断提供方是否处于熔断期
+
+        Args:
+            name: 提供方名称
+        """
+        with self._lock:
+            return self._state.get(name, {}).get('open_until', 0) > time.time()
+
+    def summary(self, name: str) -> Dict[str, Any]:
+        """
+        汇总单个提供方的统计数据
+
+        Args:
+            name: 提供方名称
+
+        Returns:
+            Dict[str, Any]: 包含 p50、p95、error_rate、score 等字段
+        """
+        with self._lock:
+            state = self._state.get(name)
+            if not state:
+                # 没有请求记录时耗时未知，按失败代价计，不会排到有实测数据的正常提供方之前
+                return {'name': name, 'requests': 0, 'p50': None, 'p95': None, 'error_rate': None,
+                        'score': self.timeout_penalty, 'consecutive_failures': 0, 'open_until': 0}
+            samples = list(state['samples'])
+
+        latencies = [latency for latency, success in samples if success]
+        error_rate = sum(1 for _, success in samples if not success) / len(samples) if samples else 0.0
+        p50 = percentile(latencies, 50)
+        # 预期耗时 = 成功请求的中位耗时 + 失败概率 × 失败代价
+        score = (p50 if p50 is not None else self.timeout_penalty) + error_rate * self.timeout_penalty
+        return {
+            'name': name,
+            'requests': len(samples),
+            'p50': p50,
+            'p95': percentile(latencies, 95),
+            'error_rate': error_rate,
+            'score': score,
+            'consecutive_failures': state['consecutive_failures'],
+            'open_until': state['open_until']
+        }
+
+    def order(self, providers: List[Any]) -> List[Any]:
+        """
+        按预期耗时对提供方排序并跳过熔断中的提供方
+
+        没有统计数据的提供方预期耗时记为失败代价，排在有实测数据的正常提供方之后，彼此之间保持注册顺序；
+        全部熔断时按熔断结束时间返回全部提供方，避免无提供方可用。
+
+        Args:
+            providers: 按注册优先级排序的提供方
+
+        Returns:
+            List[Any]: 排序后的提供方
+        """
+        summaries = {provider.name: self.summary(provider.name) for provider in providers}
+        available = [provider for provider in providers if not self.is_open(provider.name)]
+        if not available:
+            logger.warning("所有提供方都处于熔断期，仍按熔断结束时间依次尝试")
+            return sorted(providers, key=lambda provider: summaries[provider.name]['open_until'])
+
+        skipped = [provider.name for provider in providers if provider not in available]
+        if skipped:
+            logger.info(f"跳过熔断中的提供方: {', '.join(skipped)}")
+        # sorted 是稳定排序，预期耗时相同时保持注册顺序
+        return sorted(available, key=lambda provider: summaries[provider.name]['score'])
+
+    def format_scoreboard(self, names: Optional[List[str]] = None) -> str:
+        """
+        生成统计表格文本
+
+        Args:
+            names: 需要展示的提供方名称，默认展示全部有记录的提供方
+
+        Returns:
+            str: 表格文本
+        """
+        with self._lock:
+            names = names or sorted(self._state)
+        summaries = sorted((self.summary(name) for name in names), key=lambda item: item['score'])
+
+        def fmt(value: Optional[float]) -> str:
+            return f"{value:.3f}s" if value is not None else '-'
+
+        lines = [f"{'提供方':<26}{'请求数':>8}{'p50':>10}{'p95':>10}{'错误率':>8}{'预期耗时':>10}  状态"]
+        for item in summaries:
+            if item['open_until'] > time.time():
+                status = f"熔断至 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(item['open_until']))}"
+            else:
+                status = '正常'
+            error_rate = f"{item['error_rate']:.1%}" if item['error_rate'] is not None else '-'
+            lines.append(f"{item['name']:<26}{item['requests']:>8}{fmt(item['p50']):>10}{fmt(item['p95']):>10}"
+                         f"{error_rate:>8}{fmt(item['score']):>10}  {status}")
+        return '\n'.join(lines)
@@ -0,0 +1,278 @@
+"""
+汇率查询服务模块。
+
+启动时从 exchange_rates 载入全部快照，在内存中维护向前填充的 (日期 × 币种) 汇率表，
+之后按写入时间(updated_at)增量读取新快照并刷新。查询只读内存，不访问数据库和提供方。
+
+接口:
+    GET /rate?quote=TRY&date=2025-04-03   单个币种的汇率
+    GET /rates?date=2025-04-03            某天全部币种的汇率
+date 省略时为今天，晚于最新数据时使用最新一天的汇率，响应中的 date 为实际采用的日期。响应带强 ETag，
+客户端携带 If-None-Match 且数据未变化时返回 304。
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from currency_sync.ratebook import RateBook, forward_fill
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('rate_service')
+
+
+class RateTable:
+    """可增量刷新的内存汇率表，刷新时整体替换，查询无需加锁"""
+
+    def __init__(self, base_currency: Optional[str] = None):
+        """
+        初始化汇率表
+
+        Args:
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+        """
+        self.base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        # (RateBook, 版本号)，刷新时整体替换引用
+        self.current: Tuple[Optional[RateBook], str] = (None, '')
+        self._refresh_lock = threading.Lock()
+        self._start_date: Optional[date] = None
+        self._currencies: List[str] = []
+        self._raw = np.empty((0, 0))
+        # 每天当前采用的快照的生效时间，同一天有多份快照时以生效时间最晚的为准
+        self._day_updated_at: Dict[date, datetime] = {}
+        self._last_updated_at: Optional[datetime] = None
+        self._seen_at_last: set = set()
+        self._applied = 0
+
+    def refresh(self, db) -> int:
+        """
+        增量读取上次刷新之后写入的快照并更新汇率表
+
+        Args:
+            db: ExchangeRateDB 实例
+
+        Returns:
+            int: 本次应用的快照数
+        """
+        with self._refresh_lock:
+            snapshots = []
+            for snapshot in db.iter_snapshots(base_currency=self.base_currency,
+                                              updated_since=self._last_updated_at):
+                # updated_at 只精确到秒，上次最后一秒写入的快照会被再次读到
+                key = (snapshot['data_provider'], snapshot['data_updated_at'])
+                if snapshot['updated_at'] == self._last_updated_at and key in self._seen_at_last:
+                    continue
+                snapshots.append(snapshot)
+
+            if not snapshots:
+                return 0
+
+            self._apply(snapshots)
+            last_updated_at = max(snapshot['updated_at'] for snapshot in snapshots)
+            if last_updated_at != self._last_updated_at:
+                self._seen_at_last = set()
+            self._seen_at_last |= {(snapshot['data_provider'], snapshot['data_updated_at'])
+                                   for snapshot in snapshots if snapshot['updated_at'] == last_updated_at}
+            self._last_updated_at = last_updated_at
+            self._applied += len(snapshots)
+
+            book = RateBook(self.base_currency, self._start_date, self._currencies, forward_fill(self._raw))
+            version = hashlib.sha1(f"{self._last_updated_at.isoformat()}:{self._applied}".encode()).hexdigest()[:16]
+            self.current = (book, version)
+            logger.info(f"应用 {len(snapshots)} 份快照，汇率表范围 {book.start_date.isoformat()} 至 "
+                        f"{book.end_date.isoformat()}，{len(self._currencies)} 个币种")
+            return len(snapshots)
+
+    def _apply(self, snapshots: List[Dict[str, Any]]) -> None:
+        """将快照写入未填充的原始矩阵，按需扩展日期和币种"""
+        days = [snapshot['data_updated_at'].date() for snapshot in snapshots]
+        start_date = min(days + ([self._start_date] if self._start_date else []))
+        end_date = max(days + ([self._start_date + timedelta(days=self._raw.shape[0] - 1)]
+                               if self._start_date else []))
+
+        currencies = sorted(set(self._currencies).union(
+            *(snapshot['currencies'] for snapshot in snapshots), {self.base_currency}))
+        raw = np.full(((end_date - start_date).days + 1, len(currencies)), np.nan)
+        if self._raw.size:
+            offset = (self._start_date - start_date).days
+            columns = np.searchsorted(currencies, self._currencies)
+            raw[offset:offset + self._raw.shape[0], columns] = self._raw
+        index = {currency: i for i, currency in enumerate(currencies)}
+
+        for day, snapshot in zip(days, snapshots):
+            if day in self._day_updated_at and self._day_updated_at[day] > snapshot['data_updated_at']:
+                continue
+            self._day_updated_at[day] = snapshot['data_updated_at']
+            row = raw[(day - start_date).days]
+            row[:] = np.nan
+            for currency, rate in snapshot['currencies'].items():
+                if rate:
+                    row[index[currency]] = rate
+            row[index[self.base_currency]] = 1.0
+
+        self._start_date, self._currencies, self._raw = start_date, currencies, raw
+
+
+class RateHTTPServer(ThreadingHTTPServer):
+    """持有汇率表的多线程 HTTP 服务"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], table: RateTable):
+        self.table = table
+        # 版本号 -> {行号: /rates 响应体}，刷新后旧版本自动失效
+        self.rates_bodies: Tuple[str, Dict[int, bytes]] = ('', {})
+        super().__init__(address, RateRequestHandler)
+
+
+class RateRequestHandler(BaseHTTPRequestHandler):
+    """汇率查询请求处理"""
+
+    server: RateHTTPServer
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        book, version = self.server.table.current
+        if book is None:
+            return self._send_error(503, "汇率数据尚未载入")
+
+        try:
+            day = date.fromisoformat(params['date']) if params.get('date') else date.today()
+        except ValueError:
+            return self._send_error(400, f"无效的日期: {params['date']}")
+
+        row = (day - book.start_date).days
+        if row < 0:
+            return self._send_error(404, f"{day.isoformat()} 早于最早的汇率日期 {book.start_date.isoformat()}")
+        row = min(row, book.matrix.shape[0] - 1)
+
+        if url.path == '/rate':
+            self._handle_rate(book, version, params, day, row)
+        elif url.path == '/rates':
+            self._handle_rates(book, version, day, row)
+        else:
+            self._send_error(404, f"未知路径: {url.path}")
+
+    def _handle_rate(self, book: RateBook, version: str, params: Dict[str, str], day: date, row: int) -> None:
+        quote = params.get('quote', '').upper()
+        if not quote:
+            return self._send_error(400, "缺少参数 quote")
+        rate = book.rate(quote, day)
+        if rate != rate:
+            return self._send_error(404, f"没有 {quote} 在 {day.isoformat()} 的汇率")
+
+        etag = f'"{version}-{row}-{quote}"'
+        if self._not_modified(etag):
+            return
+        self._send_json(200, {
+            'base': book.base_currency,
+            'quote': quote,
+            'date': (np.datetime64(book.start_date, 'D') + row).item().isoformat(),
+            'rate': rate
+        }, etag)
+
+    def _handle_rates(self, book: RateBook, version: str, day: date, row: int) -> None:
+        etag = f'"{version}-{row}"'
+        if self._not_modified(etag):
+            return
+
+        # 同一天的响应体只生成一次
+        cached_version, bodies = self.server.rates_bodies
+        if cached_version != version:
+            bodies = {}
+            self.server.rates_bodies = (version, bodies)
+        if row not in bodies:
+            values = book.matrix[row]
+            rates = {currency: float(rate) for currency, rate in zip(book.currencies.tolist(), values.tolist())
+                     if rate == rate}
+            bodies[row] = json.dumps({
+                'base': book.base_currency,
+                'date': (np.datetime64(book.start_date, 'D') + row).item().isoformat(),
+                'rates': rates
+            }, separators=(',', ':')).encode('utf-8')
+        self._send_body(200, bodies[row], etag)
+
+    def _not_modified(self, etag: str) -> bool:
+        """客户端缓存仍然有效时返回 304"""
+        if_none_match = self.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if '*' not in tags and etag not in tags:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        return True
+
+    def _send_json(self, status: int, payload: Dict[str, Any], etag: Optional[str] = None) -> None:
+        self._send_body(status, json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), etag)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json(status, {'error': message})
+
+    def _send_body(self, status: int, body: bytes, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            # 允许缓存，但每次使用前需用 ETag 重新验证
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+
+def run_rate_service(host: str, port: int, refresh_interval: float, base_currency: Optional[str] = None,
+                     db=None) -> None:
+    """
+    运行汇率查询服务，直到收到 KeyboardInterrupt
+
+    Args:
+        host: 监听地址
+        port: 监听端口
+        refresh_interval: 增量刷新间隔(秒)
+        base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+        db: ExchangeRateDB 实例，默认新建
+    """
+    from currency_sync.db import ExchangeRateDB
+
+    db = db or ExchangeRateDB()
+    table = RateTable(base_currency)
+    table.refresh(db)
+
+    stop = threading.Event()
+
+    def refresh_loop() -> None:
+        while not stop.wait(refresh_interval):
+            try:
+                table.refresh(db)
+            except Exception as e:
+                logger.error(f"刷新汇率表时发生错误: {str(e)}")
+
+    refresher = threading.Thread(target=refresh_loop, name='rate-refresh', daemon=True)
+    refresher.start()
+
+    server = RateHTTPServer((host, port), table)
+    logger.info(f"汇率查询服务监听 http://{host}:{port}，每 {refresh_interval:.0f}s 增量刷新")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        db.close()
+        logger.info("汇率查询服务已停止")
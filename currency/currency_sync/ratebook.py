@@ -0,0 +1,209 @@
+"""
+内存汇率矩阵模块。
+
+将 exchange_rates 的历史快照一次性载入为 (日期 × 币种) 的 float64 稠密矩阵，
+缺失的日期用之前最近一天的汇率向前填充，换算时整列向量化计算，不逐行循环。
+"""
+
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('ratebook')
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """
+    沿日期轴(第0维)向前填充NaN
+
+    Args:
+        matrix: (日期 × 币种) 矩阵
+
+    Returns:
+        np.ndarray: 填充后的新矩阵，首个有效值之前仍为NaN
+    """
+    if matrix.size == 0:
+        return matrix.copy()
+    rows = np.where(~np.isnan(matrix), np.arange(matrix.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+
+class RateBook:
+    """按 (日期 × 币种) 存储的汇率矩阵，值为1单位基础货币可兑换的该币种数量"""
+
+    def __init__(self, base_currency: str, start_date: date, currencies: Iterable[str], matrix: np.ndarray):
+        """
+        初始化汇率矩阵
+
+        Args:
+            base_currency: 基础货币
+            start_date: 矩阵第0行对应的日期
+            currencies: 按字母序排列的币种，与矩阵的列一一对应
+            matrix: 已向前填充的 (日期 × 币种) float64 矩阵
+        """
+        self.base_currency = base_currency
+        self.start_date = start_date
+        self.currencies = np.asarray(list(currencies), dtype=str)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+        self._index = {currency: i for i, currency in enumerate(self.currencies.tolist())}
+
+    @property
+    def end_date(self) -> date:
+        """矩阵最后一行对应的日期"""
+        return (np.datetime64(self.start_date, 'D') + self.matrix.shape[0] - 1).item()
+
+    @classmethod
+    def from_snapshots(cls, base_currency: str, snapshots: Iterable[Dict[str, Any]]) -> 'RateBook':
+        """
+        由按时间排序的快照构建汇率矩阵，同一天有多份快照时以最后一份为准
+
+        Args:
+            base_currency: 基础货币
+            snapshots: 包含 currencies、data_updated_at 的快照，格式同 ExchangeRateDB.iter_snapshots
+
+        Returns:
+            RateBook: 汇率矩阵
+        """
+        daily: Dict[date, Dict[str, float]] = {}
+        for snapshot in snapshots:
+            updated_at = snapshot['data_updated_at']
+            day = updated_at.date() if isinstance(updated_at, datetime) else updated_at
+            daily[day] = snapshot['currencies']
+
+        if not daily:
+            raise ValueError(f"没有可用的 {base_currency} 汇率快照")
+
+        start_date, end_date = min(daily), max(daily)
+        currencies = sorted({currency for rates in daily.values() for currency in rates} | {base_currency})
+        index = {currency: i for i, currency in enumerate(currencies)}
+
+        matrix = np.full(((end_date - start_date).days + 1, len(currencies)), np.nan)
+        for day, rates in daily.items():
+            row = matrix[(day - start_date).days]
+            for currency, rate in rates.items():
+                if rate:
+                    row[index[currency]] = rate
+            row[index[base_currency]] = 1.0
+
+        logger.info(f"载入 {len(daily)} 天 {len(currencies)} 个币种的汇率，"
+                    f"范围 {start_date.isoformat()} 至 {end_date.isoformat()}")
+        return cls(base_currency, start_date, currencies, forward_fill(matrix))
+
+    @classmethod
+    def from_db(cls, db=None, base_currency: Optional[str] = None, start_date: Optional[date] = None,
+                end_date: Optional[date] = None) -> 'RateBook':
+        """
+        从数据库一次性载入汇率矩阵
+
+        Args:
+            db: ExchangeRateDB 实例，默认新建
+            base_currency: 基础货币，默认读取环境变量 BASE_CURRENCY
+            start_date: 开始日期(包含)，为None时不限制
+            end_date: 结束日期(包含)，为None时不限制
+        """
+        from currency_sync.db import ExchangeRateDB
+
+        db = db or ExchangeRateDB()
+        base_currency = base_currency or os.getenv('BASE_CURRENCY', 'USD')
+        return cls.from_snapshots(base_currency, db.iter_snapshots(start_date, end_date, base_currency))
+
+    @classmethod
+    def load(cls, path: str) -> 'RateBook':
+        """
+        从 .npz 文件载入汇率矩阵
+
+        Args:
+            path: 文件路径
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                str(data['base_currency']),
+                data['start_date'].item(),
+                data['currencies'],
+                data['matrix']
+            )
+
+    def save(self, path: str) -> None:
+        """
+        将汇率矩阵保存为压缩的 .npz 文件
+
+        Args:
+            path: 文件路径
+        """
+        np.savez_compressed(
+            path,
+            base_currency=np.array(self.base_currency),
+            start_date=np.datetime64(self.start_date, 'D'),
+            currencies=self.currencies,
+            matrix=self.matrix
+        )
+        logger.info(f"汇率矩阵已保存到 {path}")
+
+    def rate(self, currency: str, day: date) -> float:
+        """
+        查询单个汇率，晚于最后一天时使用最后一天的汇率
+
+        Args:
+            currency: 币种
+            day: 日期
+
+        Returns:
+            float: 1单位基础货币可兑换的该币种数量，没有数据时返回NaN
+        """
+        column = self._index.get(currency)
+        row = (day - self.start_date).days
+        if column is None or row < 0:
+            return float('nan')
+        return float(self.matrix[min(row, self.matrix.shape[0] - 1), column])
+
+    def rates_at(self, currencies: Any, dates: Any) -> np.ndarray:
+        """
+        批量查询汇率
+
+        Args:
+            currencies: 币种数组(可为 pandas 列或单个币种)
+            dates: 日期数组，支持 date、datetime64、'YYYY-MM-DD' 字符串，可为 pandas 列
+
+        Returns:
+            np.ndarray: 与输入广播后形状相同的汇率数组，未知币种或早于首日的位置为NaN
+        """
+        currencies = np.asarray(currencies).astype(str)
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        currencies, dates = np.broadcast_arrays(currencies, dates)
+
+        rows = (dates - np.datetime64(self.start_date, 'D')).astype(np.int64)
+        before_start = rows < 0
+        rows = np.clip(rows, 0, self.matrix.shape[0] - 1)
+
+        columns = np.searchsorted(self.currencies, currencies)
+        columns = np.minimum(columns, len(self.currencies) - 1)
+        unknown = self.currencies[columns] != currencies
+
+        return np.where(before_start | unknown, np.nan, self.matrix[rows, columns])
+
+    def convert(self, amounts: Any, currencies: Any, dates: Any, to: Optional[str] = None) -> np.ndarray:
+        """
+        按交易日期的汇率将金额向量化换算为目标货币
+
+        Args:
+            amounts: 金额数组(可为 pandas 列)
+            currencies: 每笔金额的币种
+            dates: 每笔金额的交易日期
+            to: 目标货币，默认为基础货币
+
+        Returns:
+            np.ndarray: 换算后的金额，无法换算的位置为NaN
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        amounts, currencies, dates = np.broadcast_arrays(amounts, np.asarray(currencies), np.asarray(dates))
+        result = amounts / self.rates_at(currencies, dates)
+
+        to = to or self.base_currency
+        if to != self.base_currency:
+            result *= self.rates_at(to, dates)
+        return result
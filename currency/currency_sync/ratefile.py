@@ -0,0 +1,171 @@
+"""
+内存映射汇率文件模块。
+
+将 RateBook 导出为固定布局的二进制文件，离线任务无需数据库即可查询汇率。
+多个进程 mmap 同一个文件时共享操作系统的页缓存，读取时不复制数据。
+
+文件布局(小端):
+    头部      HEADER 结构，见下方字段说明
+    币种索引  n_currencies 个定长 ASCII 币种代码，按字母序排列，不足部分补 \\0
+    汇率矩阵  从 data_offset 开始的 (日期 × 币种) float64 矩阵，按日期行优先存储，
+              data_offset 按 64 字节对齐
+"""
+
+import os
+import mmap
+import struct
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from currency_sync.ratebook import RateBook
+from currency_sync.utils.logger import setup_logger
+
+logger = setup_logger('ratefile')
+
+MAGIC = b'CSRATES\0'
+VERSION = 1
+# magic, version, 币种代码宽度, 币种数, 天数, 首日(距 1970-01-01 的天数), 基础货币, 矩阵偏移量
+HEADER = struct.Struct('<8sHHIIq8sQ')
+ALIGNMENT = 64
+
+
+def write_ratefile(book: RateBook, path: str) -> None:
+    """
+    将汇率矩阵写入内存映射汇率文件
+
+    先写临时文件再原子替换，已经映射旧文件的进程不受影响。
+
+    Args:
+        book: 汇率矩阵
+        path: 文件路径
+    """
+    currencies = [currency.encode('ascii') for currency in book.currencies.tolist()]
+    code_width = max([len(code) for code in currencies] + [len(book.base_currency)])
+    n_days, n_currencies = book.matrix.shape
+
+    index_size = code_width * n_currencies
+    data_offset = -(-(HEADER.size + index_size) // ALIGNMENT) * ALIGNMENT
+    start_days = int(np.datetime64(book.start_date, 'D').astype(np.int64))
+
+    header = HEADER.pack(MAGIC, VERSION, code_width, n_currencies, n_days, start_days,
+                         book.base_currency.encode('ascii'), data_offset)
+    index = b''.join(code.ljust(code_width, b'\0') for code in currencies)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(index)
+        f.write(b'\0' * (data_offset - HEADER.size - index_size))
+        f.write(np.ascontiguousarray(book.matrix, dtype='<f8').tobytes())
+    os.replace(tmp_path, path)
+    logger.info(f"汇率文件已保存到 {path}，{n_days} 天 × {n_currencies} 个币种")
+
+
+class RateFile:
+    """只读映射的汇率文件，可作为上下文管理器使用"""
+
+    def __init__(self, path: str):
+        """
+        映射汇率文件
+
+        Args:
+            path: 文件路径
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, code_width, n_currencies, n_days, start_days, base, data_offset = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} 不是汇率文件")
+        if version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"不支持的汇率文件版本: {version}")
+
+        self.base_currency = base.rstrip(b'\0').decode('ascii')
+        self.start_date: date = (np.datetime64(start_days, 'D')).item()
+        self.currencies: List[str] = [
+            self._mmap[offset:offset + code_width].rstrip(b'\0').decode('ascii')
+            for offset in range(HEADER.size, HEADER.size + code_width * n_currencies, code_width)
+        ]
+        self._index: Dict[str, int] = {currency: i for i, currency in enumerate(self.currencies)}
+        # 直接在映射内存上构建只读视图，不复制数据
+        self.matrix = np.ndarray((n_days, n_currencies), dtype='<f8', buffer=self._mmap, offset=data_offset)
+
+    def __enter__(self) -> 'RateFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def end_date(self) -> date:
+        """最后一天的日期"""
+        return (np.datetime64(self.start_date, 'D') + self.matrix.shape[0] - 1).item()
+
+    def rate(self, currency: str, day: date) -> float:
+        """
+        查询单个汇率，晚于最后一天时使用最后一天的汇率
+
+        Args:
+            currency: 币种
+            day: 日期
+
+        Returns:
+            float: 1单位基础货币可兑换的该币种数量，没有数据时返回NaN
+        """
+        column = self._index.get(currency)
+        row = (day - self.start_date).days
+        if column is None or row < 0 or not self.matrix.shape[0]:
+            return float('nan')
+        return float(self.matrix[min(row, self.matrix.shape[0] - 1), column])
+
+    def rates_on(self, day: date) -> np.ndarray:
+        """
+        某一天所有币种的汇率，顺序与 currencies 一致
+
+        Args:
+            day: 日期
+
+        Returns:
+            np.ndarray: 指向映射内存的只读视图，早于首日时为全NaN数组
+        """
+        row = (day - self.start_date).days
+        if row < 0:
+            return np.full(len(self.currencies), np.nan)
+        return self.matrix[min(row, self.matrix.shape[0] - 1)]
+
+    def series(self, currency: str) -> Optional[np.ndarray]:
+        """
+        某个币种的全部历史汇率
+
+        Args:
+            currency: 币种
+
+        Returns:
+            Optional[np.ndarray]: 按日期排列的只读视图(跨步访问)，未知币种返回None
+        """
+        column = self._index.get(currency)
+        return None if column is None else self.matrix[:, column]
+
+    def to_ratebook(self) -> RateBook:
+        """
+        包装为 RateBook，复用其向量化的 rates_at 和 convert
+
+        Returns:
+            RateBook: 矩阵直接引用映射内存，不复制数据
+        """
+        return RateBook(self.base_currency, self.start_date, self.currencies, self.matrix)
+
+    def close(self) -> None:
+        """解除映射，之后不能再使用 matrix 及其视图"""
+        self.matrix = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 仍有外部视图引用映射内存时由垃圾回收负责释放
+            logger.debug(f"{self.path} 仍有视图在使用，延迟解除映射")
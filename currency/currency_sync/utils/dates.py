@@ -0,0 +1,39 @@
+"""
+日期工具模块。
+"""
+
+from datetime import date, timedelta
+from typing import Iterable, List, Tuple
+
+
+def date_range(start_date: date, end_date: date) -> List[date]:
+    """
+    生成日期列表
+
+    Args:
+        start_date: 开始日期(包含)
+        end_date: 结束日期(包含)
+
+    Returns:
+        List[date]: 按时间排序的日期列表
+    """
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def contiguous_ranges(dates: Iterable[date]) -> List[Tuple[date, date]]:
+    """
+    将日期集合合并为若干连续区间
+
+    Args:
+        dates: 日期集合
+
+    Returns:
+        List[Tuple[date, date]]: 按时间排序的 (开始日期, 结束日期) 列表，均包含端点
+    """
+    ranges = []
+    for target_date in sorted(dates):
+        if ranges and target_date - ranges[-1][1] == timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], target_date)
+        else:
+            ranges.append((target_date, target_date))
+    return ranges
@@ -1,40 +1,98 @@
 """
 日志工具模块。
+
+所有模块的日志记录器共用一个 QueueHandler，由后台 QueueListener 线程统一写入
+一个文件处理器和一个控制台处理器，记录日志时只入队，不在调用线程中做磁盘I/O。
+环境变量 LOG_FORMAT=json 时输出 JSON Lines，便于日志采集程序解析。
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from datetime import datetime
 from pathlib import Path
 
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_queue_handler = None
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志输出为一行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).astimezone().isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """入队前只合并消息参数，异常堆栈单独保存在 exc_text 中，由写入线程的格式化器决定输出方式"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _shared_handler() -> logging.Handler:
+    """返回共享的 QueueHandler，首次调用时创建文件和控制台处理器并启动后台写入线程"""
+    global _queue_handler, _listener
+    with _lock:
+        if _queue_handler is None:
+            # 获取项目根目录
+            project_root = Path(__file__).parent.parent.parent
+            log_file = project_root / 'logs' / 'currency_sync.log'
+            # 确保日志目录存在
+            log_file.parent.mkdir(exist_ok=True)
+
+            if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+                formatter = JsonFormatter()
+            else:
+                formatter = logging.Formatter(TEXT_FORMAT)
+            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            console_handler = logging.StreamHandler()
+            for handler in (file_handler, console_handler):
+                handler.setFormatter(formatter)
+
+            log_queue = queue.SimpleQueue()
+            _queue_handler = _QueueHandler(log_queue)
+            _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler,
+                                                       respect_handler_level=True)
+            _listener.start()
+            # 退出前写完队列中剩余的日志
+            atexit.register(_listener.stop)
+    return _queue_handler
+
+
 def setup_logger(name='currency_sync'):
     """配置并返回日志记录器"""
-    # 获取项目根目录
-    project_root = Path(__file__).parent.parent.parent
-    log_file = project_root / 'logs' / 'currency_sync.log'
-    
-    # 确保日志目录存在
-    log_file.parent.mkdir(exist_ok=True)
-    
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
-    
+
     # 避免重复添加处理器
-    if not logger.handlers:
-        # 文件处理器
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setLevel(logging.INFO)
-        
-        # 控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
-        # 格式化器
-        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        # 添加处理器
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-    
-    return logger
\ No newline at end of file
+    handler = _shared_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+
+    return logger
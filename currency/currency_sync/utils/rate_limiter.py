@@ -0,0 +1,50 @@
+"""
+限速工具模块。
+"""
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        初始化限速器
+
+        Args:
+            rate: 每秒允许的请求数，小于等于0表示不限速
+            burst: 令牌桶容量，即允许的突发请求数
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，令牌不足时阻塞等待"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """获取一个令牌，令牌不足时在事件循环中等待，不阻塞其他协程"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _reserve(self) -> float:
+        """预留一个令牌，返回需要等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 令牌可以透支，后来的调用方会据此排队等待更久
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
@@ -1,28 +1,23 @@
 #!/bin/bash
-# 同步 3 月份汇率数据的脚本
+# 同步一段日期范围的历史汇率数据
+# 用法: ./syn_history.sh 2023-03-01 2023-03-31 [并发数]
+
+START_DATE=${1:-2023-03-01}
+END_DATE=${2:-2023-03-17}
+CONCURRENCY=${3:-4}
 
 # 设置日志文件
-LOG_FILE="sync_march_history.log"
-echo "开始同步 3 月份汇率数据: $(date)" > $LOG_FILE
+LOG_FILE="sync_history.log"
+echo "开始同步 $START_DATE 至 $END_DATE 汇率数据: $(date)" > $LOG_FILE
+
+# 单进程内并发回填整个日期范围，请求频率由各提供方的限速配置控制
+poetry run currency_sync --from $START_DATE --to $END_DATE --concurrency $CONCURRENCY 2>&1 | tee -a $LOG_FILE
 
-# 循环处理 3 月 1 日到 3 月 31 日
-for day in {01..17}; do
-    date="2023-03-$day"
-    echo "正在同步 $date 的汇率数据..." | tee -a $LOG_FILE
-    
-    # 运行同步命令并记录输出
-    poetry run currency_sync -d $date 2>&1 | tee -a $LOG_FILE
-    
-    # 检查命令执行状态
-    if [ ${PIPESTATUS[0]} -eq 0 ]; then
-        echo "成功同步 $date 的汇率数据" | tee -a $LOG_FILE
-    else
-        echo "同步 $date 的汇率数据失败" | tee -a $LOG_FILE
-    fi
-    
-    # 添加间隔，避免频繁请求 API
-    echo "等待 3 秒后继续..." | tee -a $LOG_FILE
-    sleep 1
-done
+# 检查命令执行状态
+if [ ${PIPESTATUS[0]} -eq 0 ]; then
+    echo "成功同步 $START_DATE 至 $END_DATE 的汇率数据" | tee -a $LOG_FILE
+else
+    echo "部分日期同步失败，请查看上方汇总" | tee -a $LOG_FILE
+fi
 
-echo "3 月份汇率数据同步完成: $(date)" | tee -a $LOG_FILE
\ No newline at end of file
+echo "汇率数据同步完成: $(date)" | tee -a $LOG_FILE
@@ -0,0 +1,308 @@
+"""
+ExchangeRateDB 测试。
+
+用内存中的 FakeConnection 模拟 MySQL，只实现被测流程用到的语句。
+"""
+
+import json
+import re
+from datetime import datetime
+
+import pytest
+
+from currency_sync.db.database import ExchangeRateDB, apply_delta
+
+
+class FakeCursor:
+    """按语句开头分发到 FakeConnection 中的内存表"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.lastrowid = None
+        self._result = []
+
+    def execute(self, sql, params=()):
+        sql = re.sub(r'\s+', ' ', sql).strip()
+        self.conn.statements.append(sql)
+        rows = self.conn.rates
+        self._result = []
+
+        if sql.startswith('SELECT COUNT(*) FROM information_schema.COLUMNS'):
+            self._result = [(2 if self.conn.delta_columns else 0,)]
+        elif sql.startswith('INSERT INTO exchange_rates '):
+            if not self.conn.delta_columns and 'keyframe_id' in sql:
+                raise RuntimeError("Unknown column 'snapshot_type' in 'field list'")
+            base, currencies, provider, updated_at = params[:4]
+            snapshot_type = 'delta' if "'delta'" in sql else 'full'
+            keyframe_id = params[4] if snapshot_type == 'delta' else None
+            existing = next((row for row in rows if (row['base_currency'], row['data_provider'],
+                                                     row['data_updated_at']) == (base, provider, updated_at)), None)
+            if existing is None:
+                existing = {'id': len(rows) + 1, 'base_currency': base, 'data_provider': provider,
+                            'data_updated_at': updated_at}
+                rows.append(existing)
+            existing.update(currencies=currencies, snapshot_type=snapshot_type, keyframe_id=keyframe_id)
+            self.lastrowid = existing['id']
+        elif sql.startswith('INSERT INTO exchange_rate_points'):
+            pass
+        elif sql.startswith('SELECT id, currencies, data_updated_at, keyframe_id FROM exchange_rates'):
+            matched = [row for row in rows if (row['base_currency'], row['data_provider']) == tuple(params)]
+            matched.sort(key=lambda row: row['data_updated_at'], reverse=True)
+            self._result = [(row['id'], row['currencies'], row['data_updated_at'], row['keyframe_id'])
+                            for row in matched[:1]]
+        elif sql.startswith('SELECT currencies, data_updated_at FROM exchange_rates WHERE id ='):
+            self._result = [(row['currencies'], row['data_updated_at']) for row in rows if row['id'] == params[0]]
+        elif sql.startswith('SELECT currencies, NULL AS keyframe_id FROM exchange_rates WHERE base_currency = %s'):
+            matched = [row for row in rows if row['base_currency'] == params[0]]
+            matched.sort(key=lambda row: (row['data_updated_at'], row['id']), reverse=True)
+            self._result = [(row['currencies'], None) for row in matched[:1]]
+        elif sql.startswith('SELECT COUNT(*) FROM exchange_rates WHERE keyframe_id ='):
+            self._result = [(sum(1 for row in rows if row['keyframe_id'] == params[0]),)]
+        else:
+            raise AssertionError(f"未模拟的语句: {sql}")
+
+    def executemany(self, sql, seq_params):
+        for params in seq_params:
+            self.execute(sql, params)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """同时充当连接池，所有 ExchangeRateDB 实例共享同一份数据"""
+
+    def __init__(self, delta_columns=True):
+        self.rates = []
+        self.statements = []
+        self.delta_columns = delta_columns
+
+    def get_connection(self):
+        return self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_db(conn, keyframe_interval=4):
+    db = ExchangeRateDB(config={}, keyframe_interval=keyframe_interval)
+    db._pool = conn
+    return db
+
+
+def snapshot(day, hour, eur):
+    return {
+        'currencies': {'EUR': eur, 'JPY': 150.0, 'GBP': 0.8, 'CNY': 7.1},
+        'data_provider': 'Currencyapi',
+        'data_updated_at': datetime(2026, 10, day, hour)
+    }
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection()
+
+
+def test_fresh_instance_continues_existing_keyframe(conn):
+    """每次同步都是新进程时，差量编码仍基于数据库中已有的关键帧"""
+    assert make_db(conn).save_rates_many([snapshot(1, 0, 0.90)], 'USD')
+    assert make_db(conn).save_rates_many([snapshot(1, 1, 0.91)], 'USD')
+
+    keyframe, delta = conn.rates
+    assert keyframe['snapshot_type'] == 'full'
+    assert delta['snapshot_type'] == 'delta'
+    assert delta['keyframe_id'] == keyframe['id']
+    assert json.loads(delta['currencies']) == {'EUR': 0.91}
+    assert apply_delta(json.loads(keyframe['currencies']), json.loads(delta['currencies'])) == \
+        snapshot(1, 1, 0.91)['currencies']
+
+
+def test_fresh_instance_counts_existing_deltas(conn):
+    """恢复的关键帧段计入已有差量，段满后写新的关键帧"""
+    for hour in range(6):
+        assert make_db(conn).save_rates_many([snapshot(1, hour, 0.90 + hour / 100)], 'USD')
+
+    types = [row['snapshot_type'] for row in conn.rates]
+    assert types == ['full', 'delta', 'delta', 'delta', 'full', 'delta']
+    assert conn.rates[5]['keyframe_id'] == conn.rates[4]['id']
+
+
+def test_fresh_instance_does_not_cross_months(conn):
+    assert make_db(conn).save_rates_many([snapshot(31, 0, 0.90)], 'USD')
+    next_month = dict(snapshot(1, 0, 0.91), data_updated_at=datetime(2026, 11, 1))
+    assert make_db(conn).save_rates_many([next_month], 'USD')
+
+    assert [row['snapshot_type'] for row in conn.rates] == ['full', 'full']
+
+
+def test_restored_state_is_loaded_once(conn):
+    make_db(conn).save_rates_many([snapshot(1, 0, 0.90)], 'USD')
+    db = make_db(conn)
+    conn.statements.clear()
+    db.save_rates_many([snapshot(1, 1, 0.91)], 'USD')
+    db.save_rates_many([snapshot(1, 2, 0.92)], 'USD')
+
+    lookups = [sql for sql in conn.statements if sql.startswith('SELECT id, currencies')]
+    assert len(lookups) == 1
+
+
+@pytest.mark.parametrize('keyframe_interval', [0, 4])
+def test_legacy_schema_without_delta_columns(keyframe_interval):
+    """未执行差量存储升级语句的旧表照常读写完整快照"""
+    conn = FakeConnection(delta_columns=False)
+    db = make_db(conn, keyframe_interval)
+    assert db.save_rates_many([snapshot(1, 0, 0.90)], 'USD')
+    assert db.save_rates_many([snapshot(1, 1, 0.91)], 'USD')
+
+    assert [json.loads(row['currencies'])['EUR'] for row in conn.rates] == [0.90, 0.91]
+    assert db.get_latest_rates('USD') == snapshot(1, 1, 0.91)['currencies']
+    assert not [sql for sql in conn.statements if 'snapshot_type' in sql and 'information_schema' not in sql]
+    assert len([sql for sql in conn.statements if 'information_schema.COLUMNS' in sql]) == 1
+
+
+class FakePartitionCursor:
+    """模拟 maintain_partitions 用到的分区和建表语句，行为与 MySQL 的限制一致"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = []
+
+    def execute(self, sql, params=()):
+        sql = re.sub(r'\s+', ' ', sql).strip()
+        partitions, tables = self.conn.partitions, self.conn.tables
+        self._result = []
+
+        if sql.startswith('SELECT PARTITION_NAME'):
+            self._result = [(name,) for name in partitions]
+        elif sql.startswith('SELECT 1 FROM information_schema.TABLES'):
+            self._result = [(1,)] if params[0] in tables else []
+        elif match := re.fullmatch(r'ALTER TABLE exchange_rates REORGANIZE PARTITION pmax INTO \((.*)\)', sql):
+            rows = partitions.pop('pmax')
+            for name in re.findall(r'PARTITION (p\d{6}|pmax) ', match.group(1)):
+                partitions[name] = []
+            partitions['pmax'] = rows
+        elif match := re.fullmatch(r'CREATE TABLE (\w+) LIKE exchange_rates', sql):
+            if match.group(1) in tables:
+                raise RuntimeError(f"Table '{match.group(1)}' already exists")
+            tables[match.group(1)] = {'partitioned': True, 'rows': []}
+        elif match := re.fullmatch(r'ALTER TABLE (\w+) REMOVE PARTITIONING', sql):
+            if not tables[match.group(1)]['partitioned']:
+                raise RuntimeError("Partition management on a not partitioned table is not possible")
+            tables[match.group(1)]['partitioned'] = False
+        elif match := re.fullmatch(r'ALTER TABLE exchange_rates EXCHANGE PARTITION (\w+) WITH TABLE (\w+)', sql):
+            table = tables[match.group(2)]
+            if table['partitioned']:
+                raise RuntimeError("Table to exchange with partition is partitioned")
+            if table['rows']:
+                raise RuntimeError("Found a row that does not match the partition")
+            table['rows'], partitions[match.group(1)] = partitions[match.group(1)], table['rows']
+        elif match := re.fullmatch(r'INSERT IGNORE INTO (\w+) SELECT \* FROM (\w+)', sql):
+            target = tables[match.group(1)]['rows']
+            existing = {row['id'] for row in target}
+            target.extend(row for row in tables[match.group(2)]['rows'] if row['id'] not in existing)
+        elif match := re.fullmatch(r'DROP TABLE (\w+)', sql):
+            del tables[match.group(1)]
+        elif match := re.fullmatch(r'ALTER TABLE exchange_rates DROP PARTITION (\w+)', sql):
+            del partitions[match.group(1)]
+        else:
+            raise AssertionError(f"未模拟的语句: {sql}")
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return list(self._result)
+
+    def close(self):
+        pass
+
+
+class FakePartitionedConnection(FakeConnection):
+
+    def __init__(self, partitions, tables=None):
+        super().__init__()
+        self.partitions = partitions
+        self.tables = tables or {}
+
+    def cursor(self):
+        return FakePartitionCursor(self)
+
+
+def month_name(months):
+    """相对当前月份的分区名"""
+    return f"p{ExchangeRateDB._add_months(datetime.now().date().replace(day=1), months):%Y%m}"
+
+
+@pytest.fixture
+def partitioned():
+    old = month_name(-13)
+    return FakePartitionedConnection({
+        old: [{'id': 1}, {'id': 2}],
+        month_name(-1): [{'id': 3}],
+        month_name(0): [],
+        'pmax': []
+    })
+
+
+def maintain(conn):
+    db = ExchangeRateDB(config={})
+    db._pool = conn
+    return db.maintain_partitions(months_ahead=1, retention_months=12, archive=True)
+
+
+def test_archive_expired_partition(partitioned):
+    old = month_name(-13)
+    summary = maintain(partitioned)
+
+    assert summary['archived'] == [old]
+    assert summary['dropped'] == [old]
+    assert old not in partitioned.partitions
+    assert set(partitioned.tables) == {f"exchange_rates_{old}"}
+    assert partitioned.tables[f"exchange_rates_{old}"] == {'partitioned': False, 'rows': [{'id': 1}, {'id': 2}]}
+
+
+def test_archive_rerun_is_noop(partitioned):
+    maintain(partitioned)
+    tables = {name: dict(table) for name, table in partitioned.tables.items()}
+    summary = maintain(partitioned)
+
+    assert summary == {'created': [], 'archived': [], 'dropped': []}
+    assert partitioned.tables == tables
+
+
+def test_archive_into_existing_non_empty_table(partitioned):
+    """归档表已存在(未分区且有数据)时合并而不是报错"""
+    old = month_name(-13)
+    partitioned.tables[f"exchange_rates_{old}"] = {'partitioned': False, 'rows': [{'id': 1}, {'id': 9}]}
+    maintain(partitioned)
+
+    rows = partitioned.tables[f"exchange_rates_{old}"]['rows']
+    assert sorted(row['id'] for row in rows) == [1, 2, 9]
+    assert old not in partitioned.partitions
+
+
+def test_archive_resumes_after_interrupted_exchange(partitioned):
+    """上一次在交换分区之后中断时，暂存表中的数据并入归档表"""
+    old = month_name(-13)
+    staged, partitioned.partitions[old] = partitioned.partitions[old], []
+    partitioned.tables[f"exchange_rates_{old}_staging"] = {'partitioned': False, 'rows': staged}
+    maintain(partitioned)
+
+    assert set(partitioned.tables) == {f"exchange_rates_{old}"}
+    assert sorted(row['id'] for row in partitioned.tables[f"exchange_rates_{old}"]['rows']) == [1, 2]
+    assert old not in partitioned.partitions
@@ -0,0 +1,191 @@
+"""
+列式输出模块
+
+将按批次流式得到的CSV结果转换为带类型的 Arrow 记录批次，写入压缩的 Parquet 或
+Arrow IPC 文件，下游只读取少数几列时无需再逐行解析字符串。
+依赖 pyarrow(可选依赖，只有使用 --format parquet/arrow 时才需要安装)。
+
+列类型默认由第一个有数据的批次推断，之后的批次按同一结构解析，保证各批次类型一致；
+可以用结构提示文件(JSON，列名 -> 类型名，如 {"time": "timestamp[s]", "passback_content": "string"})
+固定部分列的类型，类型名与 pyarrow.type_for_alias 一致。
+"""
+
+# sensor 和 report 是各自独立安装、以脚本方式运行的项目，为避免跨项目导入，本模块在
+# sensor/columnar.py 和 report/columnar.py 中各有一份，两份内容完全相同，修改时须同步更新，
+# 可用 shell/check_columnar_copies.sh 检查。两个项目的 sql_to_csv.py 只共用限速、分批和流式写入
+# 的辅助函数，sensor 版本另有批次清单、断点续跑和自适应分批，两者不是副本。
+
+import io
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 可选依赖
+    pa = None
+
+FORMATS = ('parquet', 'arrow')
+
+# 每次从CSV中解析的字节数
+BLOCK_SIZE = 64 * 1024 * 1024
+# 累积到该行数再写出一个 Parquet 行组(Arrow 文件的记录批次)，小批次较多时避免产生大量零碎的行组
+ROW_GROUP_ROWS = 1000000
+
+
+def load_schema_hint(path):
+    """
+    读取结构提示文件
+
+    Returns:
+        dict: 列名 -> pyarrow 类型
+    """
+    if not path:
+        return {}
+    require_pyarrow()
+    with open(path, 'r', encoding='utf-8') as f:
+        hint = json.load(f)
+    return {column: pa.type_for_alias(type_name) for column, type_name in hint.items()}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("--format parquet/arrow 需要安装 pyarrow: pip install pyarrow")
+
+
+class ColumnarWriter:
+    """将多个批次的CSV数据追加写入同一个 Parquet/Arrow 文件，先写临时文件，close 时原子替换"""
+
+    def __init__(self, path, file_format, schema_hint=None, compression='zstd'):
+        """
+        Args:
+            path: 输出文件路径
+            file_format: parquet 或 arrow
+            schema_hint: load_schema_hint 返回的列类型
+            compression: 压缩算法
+        """
+        require_pyarrow()
+        if file_format not in FORMATS:
+            raise ValueError(f"不支持的格式: {file_format}")
+        self.path = path
+        self.file_format = file_format
+        self.schema_hint = schema_hint or {}
+        self.compression = compression
+        self.schema = None
+        self.rows = 0
+        self._tmp_path = f"{path}.tmp"
+        self._writer = None
+        self._pending = []
+        self._pending_rows = 0
+
+    def write_csv(self, source):
+        """
+        追加一个批次的CSV数据(带标题行)
+
+        Args:
+            source: CSV 文件路径、文件对象或 bytes
+
+        Returns:
+            int: 写入的行数
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        elif isinstance(source, str) and os.path.getsize(source) == 0:
+            return 0
+
+        convert_options = pa_csv.ConvertOptions(
+            column_types=self.schema if self.schema is not None else self.schema_hint,
+            strings_can_be_null=True
+        )
+        try:
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=BLOCK_SIZE),
+                parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                convert_options=convert_options
+            )
+        except pa.ArrowInvalid as e:
+            # 空结果没有标题行
+            if 'Empty CSV file' in str(e):
+                return 0
+            raise
+
+        rows = 0
+        for batch in reader:
+            rows += self._write_batch(batch)
+        return rows
+
+    def write_rows(self, columns, rows):
+        """
+        追加一个批次的行数据，用于接口直接返回列名和行列表的情况
+
+        Returns:
+            int: 写入的行数
+        """
+        if not rows:
+            return 0
+        table = pa.table({column: [row[i] for row in rows] for i, column in enumerate(columns)})
+        if self.schema is None and self.schema_hint:
+            table = table.cast(pa.schema([
+                pa.field(field.name, self.schema_hint.get(field.name, field.type)) for field in table.schema
+            ]))
+        written = 0
+        for batch in table.to_batches():
+            written += self._write_batch(batch)
+        return written
+
+    def _write_batch(self, batch):
+        if batch.num_rows == 0:
+            return 0
+        if self.schema is None:
+            # 第一个批次中全为空的列无法推断类型，按字符串处理
+            self.schema = pa.schema([
+                pa.field(field.name, pa.string() if pa.types.is_null(field.type) else field.type)
+                for field in batch.schema
+            ])
+            self._open_writer()
+        if batch.schema != self.schema:
+            batch = pa.Table.from_batches([batch]).cast(self.schema).combine_chunks().to_batches()[0]
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= ROW_GROUP_ROWS:
+            self._flush()
+        self.rows += batch.num_rows
+        return batch.num_rows
+
+    def _open_writer(self):
+        if self.file_format == 'parquet':
+            self._writer = pq.ParquetWriter(self._tmp_path, self.schema, compression=self.compression)
+        else:
+            self._writer = pa_ipc.new_file(self._tmp_path, self.schema,
+                                           options=pa_ipc.IpcWriteOptions(compression=self.compression))
+
+    def _flush(self):
+        if not self._pending:
+            return
+        table = pa.Table.from_batches(self._pending, self.schema)
+        if self.file_format == 'parquet':
+            self._writer.write_table(table, row_group_size=max(1, table.num_rows))
+        else:
+            for batch in table.combine_chunks().to_batches():
+                self._writer.write_batch(batch)
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        """写完文件并替换到目标路径，没有任何数据时按结构提示的列输出不含数据的有效文件"""
+        if self._writer is None:
+            self.schema = pa.schema(list(self.schema_hint.items()))
+            self._open_writer()
+        self._flush()
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """放弃写入并删除临时文件"""
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
@@ -4,9 +4,16 @@ import os
 import time
 import argparse
 import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from http.client import HTTPConnection
 from datetime import datetime, timedelta
 from dotenv import load_dotenv  # 添加 dotenv 库导入
+from columnar import FORMATS, ColumnarWriter, load_schema_hint
+
+# 流式读取响应时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
 
 def setup_logging(log_file=None, debug=False):
     """设置日志配置"""
@@ -47,7 +54,7 @@ def setup_http_debugging():
 
 def query_sql_by_date_range(api_key, project, sql_template, start_date, end_date, base_url, logger):
     """
-    使用日期范围查询SQL并返回结果
+    使用日期范围查询SQL并返回未读取的流式响应
     """
     # 替换SQL模板中的日期参数
     sql = sql_template.replace("{start_date}", start_date).replace("{end_date}", end_date)
@@ -65,57 +72,239 @@ def query_sql_by_date_range(api_key, project, sql_template, start_date, end_date
         "format": "csv"
     }
 
-    # 发送请求
+    # 发送请求，以流式方式读取响应，结果集再大也不整体载入内存
     url = f"{base_url}/sql/query?project={project}"
     logger.debug(f"请求URL: {url}")
-    response = requests.post(url, headers=headers, data=payload)
+    response = requests.post(url, headers=headers, data=payload, stream=True)
     # 检查响应状态
     if response.status_code != 200:
-        logger.error(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
-        raise Exception(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
+        # 出错时响应体只是错误信息，可以整体读取
+        error_text = response.text
+        response.close()
+        logger.error(f"API请求失败，状态码: {response.status_code}, 响应: {error_text}")
+        raise Exception(f"API请求失败，状态码: {response.status_code}, 响应: {error_text}")
 
-    # 直接返回CSV格式的响应内容
-    return response.text
+    # 返回未读取的响应，由调用方边读边写入文件
+    return response
 
-def save_to_csv(data, output_file, append=False, logger=None):
+def save_to_csv(chunks, output_file, append=False, logger=None):
     """
-    将CSV格式的数据保存到文件
+    将CSV数据逐块写入文件
+
+    chunks 为字节块的迭代器(流式响应的 iter_content 或批次文件的内容)。
+    追加时跳过该批次数据的标题行；读取中途出错时把文件截断回写入前的长度，
+    不会在输出中留下半个批次的数据。
     """
     # 检查文件是否存在且不为空
     file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
-    
-    # 确定写入模式
-    mode = 'a' if append and file_exists else 'w'
-    
+
+    # 如果是追加模式且文件已存在且不为空，则不写入CSV头部
+    skip_header = append and file_exists
+    # 确定写入模式，按字节原样写入响应内容
+    mode = 'ab' if skip_header else 'wb'
+
     lines_count = 0
-    with open(output_file, mode, encoding='utf-8') as f:
-        # 如果是追加模式且文件已存在且不为空，则不写入CSV头部
-        if append and file_exists:
-            # 跳过CSV的第一行（标题行）
-            lines = data.strip().split('\n')
-            if len(lines) > 1:
-                f.write('\n'.join(lines[1:]) + '\n')
-                lines_count = len(lines) - 1
-                if logger:
-                    logger.debug(f"追加写入 {lines_count} 行数据到 {output_file}")
-        else:
-            # 直接写入完整的CSV数据
-            f.write(data)
-            if logger:
-                lines_count = data.count('\n')
-                logger.debug(f"写入 {lines_count} 行数据到 {output_file}")
+    with open(output_file, mode) as f:
+        start_pos = f.tell()
+        try:
+            last_byte = b''
+            for chunk in chunks:
+                if skip_header:
+                    # 跳过CSV的第一行（标题行），标题行可能跨越多个数据块
+                    newline = chunk.find(b'\n')
+                    if newline < 0:
+                        continue
+                    chunk = chunk[newline + 1:]
+                    skip_header = False
+                if not chunk:
+                    continue
+                f.write(chunk)
+                lines_count += chunk.count(b'\n')
+                last_byte = chunk[-1:]
+            # 保证以换行结尾，下一批次追加时不会与最后一行连在一起
+            if last_byte and last_byte != b'\n':
+                f.write(b'\n')
+                lines_count += 1
+        except BaseException:
+            f.truncate(start_pos)
+            raise
+
+    if logger:
+        action = '追加写入' if append and file_exists else '写入'
+        logger.debug(f"{action} {lines_count} 行数据到 {output_file}")
     return lines_count
 
 
+def read_chunks(path):
+    """按块读取文件内容"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+def save_part(response, part_file):
+    """将一个批次的流式响应原样写入批次文件，出错时删除不完整的文件"""
+    try:
+        with open(part_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        raise
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器，rate 小于等于0表示不限速"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 令牌可以透支，后来的调用方据此排队等待更久
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def plan_windows(start, end, interval_days):
+    """按固定天数将日期范围切分为 (开始日期, 结束日期) 字符串对"""
+    windows = []
+    current_start = start
+    while current_start <= end:
+        # 计算当前批次的结束日期
+        current_end = min(current_start + timedelta(days=interval_days - 1), end)
+        windows.append((current_start.strftime('%Y-%m-%d'), current_end.strftime('%Y-%m-%d')))
+        # 移动到下一个日期范围
+        current_start = current_end + timedelta(days=1)
+    return windows
+
+
+def export_serial(windows, query, output_file, logger, writer=None):
+    """
+    逐个批次查询，结果直接流式追加到输出文件
+
+    指定 writer(ColumnarWriter) 时每个批次先写入临时批次文件，再转换为列式数据写入 writer；
+    返回查询失败的批次列表
+    """
+    # 初始化是否为第一次写入
+    first_write = True
+    failed = []
+
+    for start_str, end_str in windows:
+        logger.info(f"查询日期范围: {start_str} 至 {end_str}")
+
+        try:
+            # 执行查询并保存结果到CSV
+            with query(start_str, end_str) as result:
+                if writer is None:
+                    lines_count = save_to_csv(result.iter_content(chunk_size=CHUNK_SIZE), output_file,
+                                              not first_write, logger)
+                else:
+                    part_file = f"{output_file}.part"
+                    save_part(result, part_file)
+                    try:
+                        lines_count = writer.write_csv(part_file)
+                    finally:
+                        os.remove(part_file)
+            first_write = False
+            logger.info(f"成功保存 {lines_count} 条记录")
+
+        except Exception as e:
+            logger.error(f"处理日期范围 {start_str} 至 {end_str} 时出错: {e}", exc_info=True)
+            failed.append((start_str, end_str))
+
+    return failed
+
+
+def export_concurrent(windows, query, output_file, concurrency, logger, writer=None):
+    """
+    多个批次并发查询，每个批次先写入各自的批次文件，
+    再按日期顺序合并到输出文件，输出与逐个批次查询时完全一致；
+    指定 writer(ColumnarWriter) 时按同样的顺序转换为列式数据写入 writer；
+    返回查询失败的批次列表，出现失败后不再合并后续批次
+    """
+    parts_dir = f"{output_file}.parts"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    def fetch(index, start_str, end_str):
+        part_file = os.path.join(parts_dir, f"{index:06d}_{start_str}_{end_str}.csv")
+        logger.info(f"查询日期范围: {start_str} 至 {end_str}")
+        with query(start_str, end_str) as result:
+            save_part(result, part_file)
+        return part_file
+
+    # 初始化是否为第一次写入
+    first_write = True
+    finished = {}
+    next_index = 0
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(fetch, index, start_str, end_str): index
+            for index, (start_str, end_str) in enumerate(windows)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            start_str, end_str = windows[index]
+            try:
+                finished[index] = future.result()
+            except Exception as e:
+                logger.error(f"处理日期范围 {start_str} 至 {end_str} 时出错: {e}", exc_info=True)
+                failed.append((start_str, end_str))
+                finished[index] = None
+
+            # 之前的批次都已完成时，按顺序合并并删除批次文件，不必等全部批次结束
+            while next_index in finished:
+                part_file = finished.pop(next_index)
+                if part_file and failed:
+                    # 输出已不完整，不会被使用，只删除批次文件
+                    os.remove(part_file)
+                elif part_file:
+                    if writer is None:
+                        lines_count = save_to_csv(read_chunks(part_file), output_file, not first_write, logger)
+                    else:
+                        lines_count = writer.write_csv(part_file)
+                    first_write = False
+                    os.remove(part_file)
+                    part_start, part_end = windows[next_index]
+                    logger.info(f"成功保存 {part_start} 至 {part_end} 的 {lines_count} 条记录")
+                next_index += 1
+
+    os.rmdir(parts_dir)
+    return failed
+
+
 def main():
     parser = argparse.ArgumentParser(description='执行SQL查询并将结果保存为CSV')
     parser.add_argument('--api-key', help='API密钥 (可选，默认从.env文件读取)')
     parser.add_argument('--project', required=True, help='项目名称')
     parser.add_argument('--sql-file', required=True, help='包含SQL模板的文件路径')
-    parser.add_argument('--output', required=True, help='输出CSV文件路径')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    parser.add_argument('--format', dest='file_format', choices=['csv', *FORMATS], default='csv',
+                        help='输出格式: csv，或需要 pyarrow 的 parquet/arrow 列式文件，默认csv')
+    parser.add_argument('--schema', help='parquet/arrow 格式的列类型提示文件(JSON，列名 -> 类型名)')
     parser.add_argument('--start-date', required=True, help='开始日期 (YYYY-MM-DD)')
     parser.add_argument('--end-date', required=True, help='结束日期 (YYYY-MM-DD)')
     parser.add_argument('--interval-days', type=int, default=1, help='每次查询的天数间隔')
+    parser.add_argument('--concurrency', type=int, default=1, help='同时查询的批次数，默认1即逐个批次查询')
+    parser.add_argument('--rate', type=float, default=1.0, help='每秒最多发起的查询数，默认1，0表示不限速')
     parser.add_argument('--base-url', default='http://bi.stary.ltd/api', help='API基础URL')
     parser.add_argument('--env-file', default='.env', help='.env文件路径')
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
@@ -163,48 +352,60 @@ def main():
     end = datetime.strptime(args.end_date, '%Y-%m-%d')
     logger.info(f"查询日期范围: {args.start_date} 至 {args.end_date}")
 
-    # 初始化是否为第一次写入
-    first_write = True
+    # 请求限速，多个并发批次共用
+    limiter = TokenBucket(args.rate)
+
+    def query(start_str, end_str):
+        limiter.acquire()
+        return query_sql_by_date_range(
+            api_key,  # 使用从环境变量获取的api_key
+            args.project,
+            sql_template,
+            start_str,
+            end_str,
+            args.base_url,
+            logger
+        )
 
     # 按日期范围分批查询
-    current_start = start
-    while current_start <= end:
-        # 计算当前批次的结束日期
-        current_end = current_start + timedelta(days=args.interval_days - 1)
-        if current_end > end:
-            current_end = end
-
-        # 格式化日期为字符串
-        start_str = current_start.strftime('%Y-%m-%d')
-        end_str = current_end.strftime('%Y-%m-%d')
-
-        logger.info(f"查询日期范围: {start_str} 至 {end_str}")
-
-        try:
-            # 执行查询
-            result = query_sql_by_date_range(
-                api_key,  # 使用从环境变量获取的api_key
-                args.project,
-                sql_template,
-                start_str,
-                end_str,
-                args.base_url,
-                logger
-            )
-
-            # 保存结果到CSV
-            lines_count = save_to_csv(result, args.output, not first_write, logger)
-            first_write = False
-            logger.info(f"成功保存 {lines_count} 条记录")
-
-        except Exception as e:
-            logger.error(f"处理日期范围 {start_str} 至 {end_str} 时出错: {e}", exc_info=True)
-
-        # 移动到下一个日期范围
-        current_start = current_end + timedelta(days=1)
-
-        # 添加延迟以避免API限制
-        time.sleep(1)
+    windows = plan_windows(start, end, args.interval_days)
+    writer = None
+    if args.file_format != 'csv':
+        writer = ColumnarWriter(args.output, args.file_format, load_schema_hint(args.schema))
+    # CSV 先写入临时文件，全部批次成功后才替换输出文件
+    tmp_output = f"{args.output}.tmp"
+    if os.path.exists(tmp_output):
+        os.remove(tmp_output)
+    try:
+        if args.concurrency > 1:
+            failed = export_concurrent(windows, query, tmp_output, args.concurrency, logger, writer)
+        else:
+            failed = export_serial(windows, query, tmp_output, logger, writer)
+    except BaseException:
+        if writer:
+            writer.abort()
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise
+
+    if failed:
+        # 有批次失败时输出不完整，保留原有输出文件并以非零状态退出
+        if writer:
+            writer.abort()
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        for start_str, end_str in failed:
+            logger.error(f"批次 {start_str} 至 {end_str} 查询失败")
+        logger.error(f"{len(failed)} 个批次失败，未写入 {args.output}")
+        sys.exit(1)
+
+    if writer:
+        writer.close()
+    else:
+        if not os.path.exists(tmp_output):
+            # 没有任何批次时也输出空文件，不保留旧的输出
+            open(tmp_output, 'wb').close()
+        os.replace(tmp_output, args.output)
 
     logger.info(f"任务完成，数据已保存到 {args.output}")
 
@@ -8,6 +8,7 @@ import logging
 from http.client import HTTPConnection
 from datetime import datetime, timedelta
 from dotenv import load_dotenv  # 添加 dotenv 库导入
+from columnar import FORMATS, ColumnarWriter, load_schema_hint
 
 def setup_logging(log_file=None, debug=False):
     """设置日志配置"""
@@ -118,7 +119,10 @@ def main():
     parser.add_argument('--api-key', help='API密钥 (可选，默认从.env文件读取)')
     parser.add_argument('--project', required=True, help='项目名称')
     parser.add_argument('--sql-file', required=True, help='包含SQL模板的文件路径')
-    parser.add_argument('--output', required=True, help='输出CSV文件路径')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    parser.add_argument('--format', dest='file_format', choices=['csv', *FORMATS], default='csv',
+                        help='输出格式: csv，或需要 pyarrow 的 parquet/arrow 列式文件，默认csv')
+    parser.add_argument('--schema', help='parquet/arrow 格式的列类型提示文件(JSON，列名 -> 类型名)')
     parser.add_argument('--start-time', required=False, help='开始时间 (YYYY-MM-DD HH:MM:SS)')
     parser.add_argument('--end-time', required=False, help='结束时间 (YYYY-MM-DD HH:MM:SS)')
     parser.add_argument('--interval-hours', type=int, default=24, help='每次查询的小时数间隔')
@@ -186,8 +190,17 @@ def main():
             logger
         )
 
-        # 保存结果到CSV
-        lines_count = save_to_csv(result, args.output, not first_write, logger)
+        # 保存结果到CSV，或转换为列式文件
+        if args.file_format == 'csv':
+            lines_count = save_to_csv(result, args.output, not first_write, logger)
+        else:
+            writer = ColumnarWriter(args.output, args.file_format, load_schema_hint(args.schema))
+            try:
+                lines_count = writer.write_csv(result.encode('utf-8'))
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
         first_write = False
         logger.info(f"成功保存 {lines_count} 条记录")
 
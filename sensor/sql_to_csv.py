@@ -1,12 +1,28 @@
 import requests
 import csv
 import os
+import sys
+import json
+import shutil
+import hashlib
+import re
 import time
 import argparse
 import logging
+import threading
+import heapq
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from http.client import HTTPConnection
 from datetime import datetime, timedelta
 from dotenv import load_dotenv  # 添加 dotenv 库导入
+from columnar import FORMATS, ColumnarWriter, load_schema_hint
+
+# 流式读取响应时每次读取的字节数
+CHUNK_SIZE = 1024 * 1024
+
+# 模板中的结束日期条件，如 date <= '{end_date}'、e.`date` <= '{end_date}'，分组1为表别名前缀
+END_DATE_PREDICATE = re.compile(r"((?:`?\w+`?\.)?)`?date`?\s*<=\s*'\{end_date\}'", re.IGNORECASE)
 
 def setup_logging(log_file=None, debug=False):
     """设置日志配置"""
@@ -46,13 +62,21 @@ def setup_http_debugging():
     requests_log.setLevel(logging.DEBUG)
     requests_log.propagate = True
 
-def query_sql_by_date_range(api_key, project, sql_template, start_date, end_date, base_url, logger):
-    """
-    使用日期范围查询SQL并返回结果
+class QueryError(Exception):
+    """API返回非200状态码"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def query_sql(api_key, project, sql, base_url, logger, timeout=None):
     """
-    # 替换SQL模板中的日期参数
-    sql = sql_template.replace("{start_date}", start_date).replace("{end_date}", end_date)
+    执行SQL并返回未读取的流式响应
 
+    Args:
+        timeout: 连接和等待数据的超时时间(秒)，为None时不超时
+    """
     # 记录执行的SQL语句
     logger.info(f"执行SQL: {sql}")
 
@@ -66,57 +90,491 @@ def query_sql_by_date_range(api_key, project, sql_template, start_date, end_date
         "format": "csv"
     }
 
-    # 发送请求
+    # 发送请求，以流式方式读取响应，结果集再大也不整体载入内存
     url = f"{base_url}/sql/query?project={project}"
     logger.debug(f"请求URL: {url}")
-    response = requests.post(url, headers=headers, data=payload)
+    response = requests.post(url, headers=headers, data=payload, stream=True, timeout=timeout)
     # 检查响应状态
     if response.status_code != 200:
-        logger.error(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
-        raise Exception(f"API请求失败，状态码: {response.status_code}, 响应: {response.text}")
+        # 出错时响应体只是错误信息，可以整体读取
+        error_text = response.text
+        response.close()
+        logger.error(f"API请求失败，状态码: {response.status_code}, 响应: {error_text}")
+        raise QueryError(f"API请求失败，状态码: {response.status_code}, 响应: {error_text}", response.status_code)
+
+    # 返回未读取的响应，由调用方边读边写入文件
+    return response
+
+def query_sql_by_date_range(api_key, project, sql_template, start_date, end_date, base_url, logger, timeout=None):
+    """
+    使用日期范围查询SQL并返回未读取的流式响应
+    """
+    # 替换SQL模板中的日期参数
+    sql = sql_template.replace("{start_date}", start_date).replace("{end_date}", end_date)
+    return query_sql(api_key, project, sql, base_url, logger, timeout)
+
+def render_window_sql(sql_template, window_start, window_end, time_column='time'):
+    """
+    按 [window_start, window_end) 时间段生成SQL
 
-    # 直接返回CSV格式的响应内容
-    return response.text
+    整天的时间段直接替换 {start_date}/{end_date}；不足一天时日期仍按覆盖的日期替换以利用分区裁剪，
+    并在 {end_date} 所在的日期条件后追加同一张表的时间条件，例如
+    e.date <= '{end_date}' 改写为 e.date <= '2024-01-01' AND e.time >= '2024-01-01 06:00:00' AND e.time < ...
 
-def save_to_csv(data, output_file, append=False, logger=None):
+    Raises:
+        ValueError: 时间段不足一天但模板中没有可改写的日期条件
     """
-    将CSV格式的数据保存到文件
+    end_day = (window_end - timedelta(seconds=1)).strftime('%Y-%m-%d')
+    sql = sql_template.replace("{start_date}", window_start.strftime('%Y-%m-%d'))
+    if window_start.time() == datetime.min.time() and window_end.time() == datetime.min.time():
+        return sql.replace("{end_date}", end_day)
+
+    def add_time_predicate(match):
+        prefix = match.group(1) or ''
+        return (f"{match.group(0)} AND {prefix}{time_column} >= '{window_start:%Y-%m-%d %H:%M:%S}'"
+                f" AND {prefix}{time_column} < '{window_end:%Y-%m-%d %H:%M:%S}'")
+
+    sql, count = END_DATE_PREDICATE.subn(add_time_predicate, sql)
+    if not count:
+        raise ValueError("SQL模板中没有 date <= '{end_date}' 形式的条件，无法按小时切分")
+    return sql.replace("{end_date}", end_day)
+
+def save_to_csv(chunks, output_file, append=False, logger=None):
+    """
+    将CSV数据逐块写入文件
+
+    chunks 为字节块的迭代器(流式响应的 iter_content 或批次文件的内容)。
+    追加时跳过该批次数据的标题行；读取中途出错时把文件截断回写入前的长度，
+    不会在输出中留下半个批次的数据。
     """
     # 检查文件是否存在且不为空
     file_exists = os.path.exists(output_file) and os.path.getsize(output_file) > 0
-    
-    # 确定写入模式
-    mode = 'a' if append and file_exists else 'w'
-    
+
+    # 如果是追加模式且文件已存在且不为空，则不写入CSV头部
+    skip_header = append and file_exists
+    # 确定写入模式，按字节原样写入响应内容
+    mode = 'ab' if skip_header else 'wb'
+
     lines_count = 0
-    with open(output_file, mode, encoding='utf-8') as f:
-        # 如果是追加模式且文件已存在且不为空，则不写入CSV头部
-        if append and file_exists:
-            # 跳过CSV的第一行（标题行）
-            lines = data.strip().split('\n')
-            if len(lines) > 1:
-                f.write('\n'.join(lines[1:]) + '\n')
-                lines_count = len(lines) - 1
-                if logger:
-                    logger.debug(f"追加写入 {lines_count} 行数据到 {output_file}")
-        else:
-            # 直接写入完整的CSV数据
-            f.write(data)
-            if logger:
-                lines_count = data.count('\n')
-                logger.debug(f"写入 {lines_count} 行数据到 {output_file}")
+    with open(output_file, mode) as f:
+        start_pos = f.tell()
+        try:
+            last_byte = b''
+            for chunk in chunks:
+                if skip_header:
+                    # 跳过CSV的第一行（标题行），标题行可能跨越多个数据块
+                    newline = chunk.find(b'\n')
+                    if newline < 0:
+                        continue
+                    chunk = chunk[newline + 1:]
+                    skip_header = False
+                if not chunk:
+                    continue
+                f.write(chunk)
+                lines_count += chunk.count(b'\n')
+                last_byte = chunk[-1:]
+            # 保证以换行结尾，下一批次追加时不会与最后一行连在一起
+            if last_byte and last_byte != b'\n':
+                f.write(b'\n')
+                lines_count += 1
+        except BaseException:
+            f.truncate(start_pos)
+            raise
+
+    if logger:
+        action = '追加写入' if append and file_exists else '写入'
+        logger.debug(f"{action} {lines_count} 行数据到 {output_file}")
     return lines_count
 
 
+def read_chunks(path):
+    """按块读取文件内容"""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+class BudgetExceeded(Exception):
+    """批次结果超过字节数或行数上限"""
+
+
+def save_part(response, part_file, max_bytes=None, max_rows=None):
+    """
+    将一个批次的流式响应原样写入批次文件
+
+    先写入 .tmp 临时文件，完整写完后再原子重命名，批次文件存在即代表内容完整。
+    超过 max_bytes 或 max_rows 时立即停止读取并抛出 BudgetExceeded。
+
+    Returns:
+        dict: 批次文件的行数(不含标题行)、字节数和 sha256 校验和
+    """
+    tmp_file = f"{part_file}.tmp"
+    digest = hashlib.sha256()
+    size = 0
+    newlines = 0
+    last_byte = b''
+    try:
+        with open(tmp_file, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if not chunk:
+                    continue
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                newlines += chunk.count(b'\n')
+                last_byte = chunk[-1:]
+                if (max_bytes and size > max_bytes) or (max_rows and newlines - 1 > max_rows):
+                    raise BudgetExceeded(f"结果超过上限: {size} 字节, {max(0, newlines - 1)} 行")
+        os.replace(tmp_file, part_file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+    # 最后一行可能没有换行符；第一行是标题行
+    lines = newlines + (1 if last_byte and last_byte != b'\n' else 0)
+    return {'rows': max(0, lines - 1), 'bytes': size, 'sha256': digest.hexdigest()}
+
+
+def file_sha256(path):
+    """计算文件的 sha256 校验和"""
+    digest = hashlib.sha256()
+    for chunk in read_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    导出清单，保存在输出文件旁的 <output>.manifest.json 中
+
+    记录导出参数和每个批次的状态(pending/done/failed)、行数、字节数和校验和，
+    每次更新后原子写回文件，进程中途退出后可以据此只重跑缺失或失败的批次。
+    固定间隔时批次的 start/end 为包含两端的日期；自适应切分时为 [start, end) 时间，
+    被拆分或续跑时重新规划的批次状态为 split/replanned，不参与合并。
+    """
+
+    def __init__(self, path, params, windows):
+        self.path = path
+        self.params = params
+        self.windows = windows
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, params, windows):
+        manifest = cls(path, params, [
+            {'start': start_str, 'end': end_str, 'status': 'pending'} for start_str, end_str in windows
+        ])
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(path, data['params'], data['windows'])
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'params': self.params, 'windows': self.windows}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def update(self, index, **fields):
+        """更新一个批次的记录并写回文件，可在多个线程中调用"""
+        with self._lock:
+            self.windows[index].update(fields)
+            self.save()
+
+    def add(self, start_str, end_str):
+        """追加一个待查询的批次，返回序号"""
+        with self._lock:
+            self.windows.append({'start': start_str, 'end': end_str, 'status': 'pending'})
+            self.save()
+            return len(self.windows) - 1
+
+    def part_file(self, parts_dir, index):
+        window = self.windows[index]
+        name = f"{index:06d}_{window['start']}_{window['end']}".replace(' ', 'T').replace(':', '')
+        return os.path.join(parts_dir, f"{name}.csv")
+
+    def is_complete(self, parts_dir, index):
+        """批次已完成且批次文件的大小和校验和与清单一致"""
+        window = self.windows[index]
+        part_file = self.part_file(parts_dir, index)
+        return (window['status'] == 'done' and os.path.exists(part_file)
+                and os.path.getsize(part_file) == window['bytes'] and file_sha256(part_file) == window['sha256'])
+
+
+class TokenBucket:
+    """线程安全的令牌桶限速器，rate 小于等于0表示不限速"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 令牌可以透支，后来的调用方据此排队等待更久
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def plan_windows(start, end, interval_days):
+    """按固定天数将日期范围切分为 (开始日期, 结束日期) 字符串对"""
+    windows = []
+    current_start = start
+    while current_start <= end:
+        # 计算当前批次的结束日期
+        current_end = min(current_start + timedelta(days=interval_days - 1), end)
+        windows.append((current_start.strftime('%Y-%m-%d'), current_end.strftime('%Y-%m-%d')))
+        # 移动到下一个日期范围
+        current_start = current_end + timedelta(days=1)
+    return windows
+
+
+def export_windows(manifest, indexes, query, parts_dir, concurrency, logger):
+    """
+    查询指定的批次，每个批次写入各自的批次文件，结果记录到清单
+
+    Args:
+        manifest: 导出清单
+        indexes: 需要查询的批次序号
+        query: 按 (开始日期, 结束日期) 发起查询并返回流式响应的函数
+        parts_dir: 批次文件目录
+        concurrency: 同时查询的批次数
+        logger: 日志记录器
+    """
+    def fetch(index):
+        window = manifest.windows[index]
+        logger.info(f"查询日期范围: {window['start']} 至 {window['end']}")
+        try:
+            with query(window['start'], window['end']) as result:
+                stats = save_part(result, manifest.part_file(parts_dir, index))
+        except Exception as e:
+            logger.error(f"处理日期范围 {window['start']} 至 {window['end']} 时出错: {e}", exc_info=True)
+            manifest.update(index, status='failed', error=str(e))
+            return
+        manifest.update(index, status='done', error=None, **stats)
+        logger.info(f"成功获取 {window['start']} 至 {window['end']} 的 {stats['rows']} 条记录")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for future in as_completed([executor.submit(fetch, index) for index in indexes]):
+            future.result()
+
+
+class AdaptivePlanner:
+    """
+    自适应批次规划
+
+    从待导出的时间段中按当前窗口大小依次切出批次；批次超时、服务端出错或结果超过
+    字节数/行数上限时对半拆分后重新查询，结果小且快时窗口加倍，最小到 minimum、最大到 maximum。
+    只在调度线程中调用，不需要加锁。
+    """
+
+    def __init__(self, gaps, initial, minimum, maximum, max_bytes=None, max_rows=None, fast_seconds=60):
+        """
+        Args:
+            gaps: 待导出的 [开始, 结束) 时间段列表
+            initial: 初始窗口大小
+            minimum: 最小窗口大小，也是切分的时间粒度
+            maximum: 最大窗口大小
+            max_bytes: 单个批次的字节数上限，为None时不限制
+            max_rows: 单个批次的行数上限，为None时不限制
+            fast_seconds: 批次耗时低于该值才会加大窗口
+        """
+        self.gaps = deque(sorted(gaps))
+        self.retry = []
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.size = min(self.maximum, max(minimum, initial))
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self.fast_seconds = fast_seconds
+
+    def next_window(self):
+        """返回下一个待查询的 (开始, 结束)，拆分出的批次优先，全部规划完时返回None"""
+        if self.retry:
+            return heapq.heappop(self.retry)
+        if not self.gaps:
+            return None
+        start, end = self.gaps[0]
+        window_end = min(start + self.size, end)
+        if window_end >= end:
+            self.gaps.popleft()
+        else:
+            self.gaps[0] = (window_end, end)
+        return start, window_end
+
+    def at_minimum(self, start, end):
+        return end - start <= self.minimum
+
+    def budget(self, start, end):
+        """批次的 (字节数上限, 行数上限)，已是最小窗口时不再限制，避免无法完成"""
+        if self.at_minimum(start, end):
+            return None, None
+        return self.max_bytes, self.max_rows
+
+    def split(self, start, end):
+        """将批次按最小粒度对半拆分后重新排队，并缩小后续窗口"""
+        half = max(self.minimum, (end - start) // 2 // self.minimum * self.minimum)
+        heapq.heappush(self.retry, (start, start + half))
+        heapq.heappush(self.retry, (start + half, end))
+        self.size = max(self.minimum, min(self.size, half))
+
+    def observe(self, start, end, stats, elapsed):
+        """根据批次的结果大小和耗时调整窗口大小"""
+        small = ((not self.max_bytes or stats['bytes'] < self.max_bytes / 4)
+                 and (not self.max_rows or stats['rows'] < self.max_rows / 4))
+        if small and elapsed < self.fast_seconds and end - start >= self.size:
+            self.size = min(self.maximum, self.size * 2)
+
+
+def uncovered(start, end, intervals):
+    """返回 [start, end) 中未被 intervals 覆盖的时间段"""
+    gaps = []
+    cursor = start
+    for interval_start, interval_end in sorted(intervals):
+        if interval_start > cursor:
+            gaps.append((cursor, interval_start))
+        cursor = max(cursor, interval_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def export_adaptive(manifest, planner, query_window, parts_dir, concurrency, logger):
+    """
+    按自适应规划查询批次，结果记录到清单
+
+    Args:
+        manifest: 导出清单
+        planner: AdaptivePlanner
+        query_window: 按 (开始时间, 结束时间) 发起查询并返回流式响应的函数，超时时间由调用方在函数内设置
+        parts_dir: 批次文件目录
+        concurrency: 同时查询的批次数
+        logger: 日志记录器
+    """
+    def fetch(index, start, end, budget):
+        started = time.monotonic()
+        with query_window(start, end) as result:
+            stats = save_part(result, manifest.part_file(parts_dir, index), *budget)
+        return stats, time.monotonic() - started
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        def fill():
+            while len(in_flight) < max(1, concurrency):
+                window = planner.next_window()
+                if window is None:
+                    return
+                start, end = window
+                index = manifest.add(f"{start:%Y-%m-%d %H:%M:%S}", f"{end:%Y-%m-%d %H:%M:%S}")
+                logger.info(f"查询时间范围: {start} 至 {end}")
+                in_flight[executor.submit(fetch, index, start, end, planner.budget(start, end))] = (index, start, end)
+
+        fill()
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index, start, end = in_flight.pop(future)
+                try:
+                    stats, elapsed = future.result()
+                except (BudgetExceeded, requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                        QueryError) as e:
+                    retryable = not isinstance(e, QueryError) or e.status_code >= 500
+                    if retryable and not planner.at_minimum(start, end):
+                        logger.warning(f"时间范围 {start} 至 {end} 需要拆分: {e}")
+                        manifest.update(index, status='split', error=str(e))
+                        planner.split(start, end)
+                        continue
+                    logger.error(f"处理时间范围 {start} 至 {end} 时出错: {e}", exc_info=True)
+                    manifest.update(index, status='failed', error=str(e))
+                    continue
+                except Exception as e:
+                    logger.error(f"处理时间范围 {start} 至 {end} 时出错: {e}", exc_info=True)
+                    manifest.update(index, status='failed', error=str(e))
+                    continue
+                manifest.update(index, status='done', error=None, **stats)
+                planner.observe(start, end, stats, elapsed)
+                logger.info(f"成功获取 {start} 至 {end} 的 {stats['rows']} 条记录，"
+                            f"耗时 {elapsed:.1f}s，下一批次窗口 {planner.size}")
+            fill()
+
+
+def merge_parts(manifest, parts_dir, output_file, logger, file_format='csv', schema_hint=None):
+    """
+    按日期顺序将已完成的批次文件合并为输出文件，先写临时文件再原子替换
+
+    CSV 格式与逐个批次直接追加写入时的输出完全一致；parquet/arrow 格式逐批次转换为带类型的列式文件。
+
+    Returns:
+        int: 合并的行数，CSV 格式包含标题行
+    """
+    done = sorted((window['start'], index) for index, window in enumerate(manifest.windows)
+                  if window['status'] == 'done')
+    if file_format != 'csv':
+        writer = ColumnarWriter(output_file, file_format, schema_hint)
+        try:
+            for _, index in done:
+                writer.write_csv(manifest.part_file(parts_dir, index))
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+        return writer.rows
+
+    tmp_file = f"{output_file}.tmp"
+    # 初始化是否为第一次写入
+    first_write = True
+    total = 0
+    for _, index in done:
+        total += save_to_csv(read_chunks(manifest.part_file(parts_dir, index)), tmp_file, not first_write, logger)
+        first_write = False
+    if first_write:
+        # 没有任何批次成功时输出空文件
+        open(tmp_file, 'wb').close()
+    os.replace(tmp_file, output_file)
+    return total
+
+
 def main():
     parser = argparse.ArgumentParser(description='执行SQL查询并将结果保存为CSV')
     parser.add_argument('--api-key', help='API密钥 (可选，默认从.env文件读取)')
     parser.add_argument('--project', required=True, help='项目名称')
     parser.add_argument('--sql-file', required=True, help='包含SQL模板的文件路径')
-    parser.add_argument('--output', required=True, help='输出CSV文件路径')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    parser.add_argument('--format', dest='file_format', choices=['csv', *FORMATS], default='csv',
+                        help='输出格式: csv，或需要 pyarrow 的 parquet/arrow 列式文件，默认csv')
+    parser.add_argument('--schema', help='parquet/arrow 格式的列类型提示文件(JSON，列名 -> 类型名)')
     parser.add_argument('--start-date', required=True, help='开始日期 (YYYY-MM-DD)')
     parser.add_argument('--end-date', required=True, help='结束日期 (YYYY-MM-DD)')
     parser.add_argument('--interval-days', type=int, default=1, help='每次查询的天数间隔')
+    parser.add_argument('--concurrency', type=int, default=1, help='同时查询的批次数，默认1即逐个批次查询')
+    parser.add_argument('--rate', type=float, default=1.0, help='每秒最多发起的查询数，默认1，0表示不限速')
+    parser.add_argument('--resume', action='store_true', help='按导出清单续跑，只查询缺失或失败的批次')
+    parser.add_argument('--timeout', type=float, help='单次查询连接和等待数据的超时时间(秒)，默认不超时')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='自适应调整批次大小: 超时或结果过大时对半拆分，结果小且快时加倍，--interval-days 为初始大小')
+    parser.add_argument('--max-mb', type=float, default=256, help='自适应模式下单个批次的结果大小上限(MB)，默认256')
+    parser.add_argument('--max-rows', type=int, default=0, help='自适应模式下单个批次的行数上限，默认0即不限制')
+    parser.add_argument('--min-hours', type=int, default=1, help='自适应模式下最小批次的小时数，默认1')
+    parser.add_argument('--max-interval-days', type=int, default=31, help='自适应模式下最大批次的天数，默认31')
+    parser.add_argument('--time-column', default='time', help='按小时切分时使用的时间列，默认time')
     parser.add_argument('--base-url', default='http://bi.stary.ltd/api', help='API基础URL')
     parser.add_argument('--env-file', default='.env', help='.env文件路径')
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
@@ -164,49 +622,101 @@ def main():
     end = datetime.strptime(args.end_date, '%Y-%m-%d')
     logger.info(f"查询日期范围: {args.start_date} 至 {args.end_date}")
 
-    # 初始化是否为第一次写入
-    first_write = True
-
-    # 按日期范围分批查询
-    current_start = start
-    while current_start <= end:
-        # 计算当前批次的结束日期
-        current_end = current_start + timedelta(days=args.interval_days - 1)
-        if current_end > end:
-            current_end = end
-
-        # 格式化日期为字符串
-        start_str = current_start.strftime('%Y-%m-%d')
-        end_str = current_end.strftime('%Y-%m-%d')
-
-        logger.info(f"查询日期范围: {start_str} 至 {end_str}")
-
-        try:
-            # 执行查询
-            result = query_sql_by_date_range(
-                api_key,  # 使用从环境变量获取的api_key
-                args.project,
-                sql_template,
-                start_str,
-                end_str,
-                args.base_url,
-                logger
-            )
-
-            # 保存结果到CSV
-            lines_count = save_to_csv(result, args.output, not first_write, logger)
-            first_write = False
-            logger.info(f"成功保存 {lines_count} 条记录")
-
-        except Exception as e:
-            logger.error(f"处理日期范围 {start_str} 至 {end_str} 时出错: {e}", exc_info=True)
-
-        # 移动到下一个日期范围
-        current_start = current_end + timedelta(days=1)
-
-        # 添加延迟以避免API限制
-        time.sleep(1)
-
+    # 请求限速，多个并发批次共用
+    limiter = TokenBucket(args.rate)
+
+    def query(start_str, end_str):
+        limiter.acquire()
+        return query_sql_by_date_range(
+            api_key,  # 使用从环境变量获取的api_key
+            args.project,
+            sql_template,
+            start_str,
+            end_str,
+            args.base_url,
+            logger,
+            args.timeout
+        )
+
+    def query_window(window_start, window_end):
+        limiter.acquire()
+        sql = render_window_sql(sql_template, window_start, window_end, args.time_column)
+        return query_sql(api_key, args.project, sql, args.base_url, logger, args.timeout)
+
+    # 导出清单和批次文件放在输出文件旁
+    manifest_file = f"{args.output}.manifest.json"
+    parts_dir = f"{args.output}.parts"
+    params = {
+        'project': args.project,
+        'sql_sha256': hashlib.sha256(sql_template.encode('utf-8')).hexdigest(),
+        'start_date': args.start_date,
+        'end_date': args.end_date
+    }
+    # 自适应模式的批次边界不固定，只要求续跑时同样使用自适应模式
+    if args.adaptive:
+        params['adaptive'] = True
+    else:
+        params['interval_days'] = args.interval_days
+
+    if args.resume and os.path.exists(manifest_file):
+        manifest = Manifest.load(manifest_file)
+        if manifest.params != params:
+            error_msg = f"{manifest_file} 的导出参数与本次不同，无法续跑: {manifest.params}"
+            logger.error(error_msg)
+            raise ValueError(error_msg)
+        logger.info(f"已从 {manifest_file} 载入导出清单")
+    else:
+        # 重新导出时清理上次遗留的批次文件
+        if os.path.isdir(parts_dir):
+            shutil.rmtree(parts_dir)
+        # 按日期范围分批查询
+        windows = [] if args.adaptive else plan_windows(start, end, args.interval_days)
+        manifest = Manifest.create(manifest_file, params, windows)
+    os.makedirs(parts_dir, exist_ok=True)
+
+    if args.adaptive:
+        # 已完成的批次保留，其余时间段重新规划
+        done = []
+        for index, window in enumerate(manifest.windows):
+            if manifest.is_complete(parts_dir, index):
+                done.append((datetime.strptime(window['start'], '%Y-%m-%d %H:%M:%S'),
+                             datetime.strptime(window['end'], '%Y-%m-%d %H:%M:%S')))
+            elif window['status'] in ('pending', 'failed', 'done'):
+                manifest.update(index, status='replanned')
+
+        # 模板不支持按小时切分时最小粒度为一天
+        minimum = timedelta(hours=max(1, args.min_hours))
+        if not END_DATE_PREDICATE.search(sql_template):
+            logger.warning("SQL模板中没有 date <= '{end_date}' 形式的条件，最小批次为一天")
+            minimum = timedelta(days=1)
+        planner = AdaptivePlanner(
+            uncovered(start, end + timedelta(days=1), done),
+            timedelta(days=args.interval_days),
+            minimum,
+            timedelta(days=args.max_interval_days),
+            int(args.max_mb * 1024 * 1024) if args.max_mb > 0 else None,
+            args.max_rows or None,
+            args.timeout / 4 if args.timeout else 60
+        )
+        logger.info(f"已完成 {len(done)} 个批次，待导出时间段 {len(planner.gaps)} 个")
+        export_adaptive(manifest, planner, query_window, parts_dir, args.concurrency, logger)
+    else:
+        pending = [index for index in range(len(manifest.windows)) if not manifest.is_complete(parts_dir, index)]
+        logger.info(f"共 {len(manifest.windows)} 个批次，需要查询 {len(pending)} 个")
+        export_windows(manifest, pending, query, parts_dir, args.concurrency, logger)
+
+    failed = [window for window in manifest.windows if window['status'] in ('pending', 'failed')]
+    if failed:
+        # 不合并不完整的结果，已有的输出文件保持不变；保留批次文件和清单，使用 --resume 只重跑失败的批次
+        for window in failed:
+            logger.error(f"日期范围 {window['start']} 至 {window['end']} 未成功导出: {window.get('error')}")
+        logger.error(f"{len(failed)} 个批次失败，未写入 {args.output}，可使用 --resume 重跑")
+        sys.exit(1)
+
+    lines_count = merge_parts(manifest, parts_dir, args.output, logger, args.file_format,
+                              load_schema_hint(args.schema))
+    shutil.rmtree(parts_dir)
+    logger.info(f"共保存 {lines_count} 行{'(含标题行)' if args.file_format == 'csv' else ''}")
     logger.info(f"任务完成，数据已保存到 {args.output}")
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ import logging
 from http.client import HTTPConnection
 from datetime import datetime, timedelta
 from dotenv import load_dotenv  # 添加 dotenv 库导入
+from columnar import FORMATS, ColumnarWriter, load_schema_hint
 
 def setup_http_debugging():
     """设置HTTP调试日志"""
@@ -78,12 +79,25 @@ def save_to_csv(data, output_file, append=False):
                 # 如果是单行数据，转换为列表的列表
                 writer.writerow(data['data'])
 
+def save_to_columnar(data, writer):
+    """
+    将数据转换为列式数据写入 ColumnarWriter
+    """
+    if not data.get('data'):
+        return
+    # 检查数据格式，与 save_to_csv 一致，单行数据转换为列表的列表
+    rows = data['data'] if isinstance(data['data'][0], list) else [data['data']]
+    writer.write_rows(data['columns'], rows)
+
 def main():
     parser = argparse.ArgumentParser(description='执行SQL查询并将结果保存为CSV')
     parser.add_argument('--api-key', help='API密钥 (可选，默认从.env文件读取)')
     parser.add_argument('--project', required=True, help='项目名称')
     parser.add_argument('--sql-file', required=True, help='包含SQL模板的文件路径')
-    parser.add_argument('--output', required=True, help='输出CSV文件路径')
+    parser.add_argument('--output', required=True, help='输出文件路径')
+    parser.add_argument('--format', dest='file_format', choices=['csv', *FORMATS], default='csv',
+                        help='输出格式: csv，或需要 pyarrow 的 parquet/arrow 列式文件，默认csv')
+    parser.add_argument('--schema', help='parquet/arrow 格式的列类型提示文件(JSON，列名 -> 类型名)')
     parser.add_argument('--start-date', required=True, help='开始日期 (YYYY-MM-DD)')
     parser.add_argument('--end-date', required=True, help='结束日期 (YYYY-MM-DD)')
     parser.add_argument('--interval-days', type=int, default=1, help='每次查询的天数间隔')
@@ -122,6 +136,9 @@ def main():
 
     # 初始化是否为第一次写入
     first_write = True
+    writer = None
+    if args.file_format != 'csv':
+        writer = ColumnarWriter(args.output, args.file_format, load_schema_hint(args.schema))
 
     # 按日期范围分批查询
     current_start = start
@@ -148,8 +165,11 @@ def main():
                 args.base_url
             )
 
-            # 保存结果到CSV
-            save_to_csv(result, args.output, not first_write)
+            # 保存结果到CSV，或转换为列式数据
+            if writer is None:
+                save_to_csv(result, args.output, not first_write)
+            else:
+                save_to_columnar(result, writer)
             first_write = False
 
             print(f"成功保存 {len(result.get('data', []))} 条记录")
@@ -163,5 +183,8 @@ def main():
         # 添加延迟以避免API限制
         time.sleep(1)
 
+    if writer:
+        writer.close()
+
 if __name__ == "__main__":
     main()
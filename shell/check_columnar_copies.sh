@@ -0,0 +1,13 @@
+#!/bin/bash
+
+# 检查 sensor/columnar.py 与 report/columnar.py 两份副本内容是否完全相同，
+# 修改其中一份后运行，不一致时输出差异并以非零状态退出。
+
+ROOT="$(cd "$(dirname "$0")/.." && pwd)"
+
+if ! diff -u "$ROOT/sensor/columnar.py" "$ROOT/report/columnar.py"; then
+    echo "Error: sensor/columnar.py 与 report/columnar.py 不一致，请同步修改" >&2
+    exit 1
+fi
+
+echo "sensor/columnar.py 与 report/columnar.py 一致"